@@ -1,9 +1,19 @@
 import json
 import os
+import threading
+import time
 import warnings
 import requests
+import numpy as np
 import pandas as pd
-from typing import Any, Dict
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+
+import metrics
+
+# Seconds to wait for FRED to connect and to send each part of a response, so
+# a hung request fails instead of holding its caller forever.
+FRED_REQUEST_TIMEOUT_IN_SECONDS = 10
 
 
 class FRED_data:
@@ -44,8 +54,11 @@ class FRED_data:
         else:
             return
 
+    @metrics.instrument("fred.request")
     def request_get_data(self, url: str, parameters: Dict[str, str]):
-        response = requests.get(url, params=parameters)
+        response = requests.get(
+            url, params=parameters, timeout=FRED_REQUEST_TIMEOUT_IN_SECONDS
+        )
         self.__raise_on_bad_response(response)
 
         return response
@@ -63,9 +76,10 @@ class FRED_data:
 
         return response.text
 
+    @metrics.instrument("fred.parse")
     def __load_and_clean_df(self, json_response: Any, series_id: str):
+        # Nothing is stored on self, the instance is shared by every request
         df_raw = pd.DataFrame(json_response["observations"])
-        self.last_raw_df = {series_id: df_raw}
 
         df_raw["Value"] = pd.to_numeric(df_raw["value"], errors="coerce")
         df_raw.dropna(subset=["Value"], inplace=True)
@@ -80,8 +94,6 @@ class FRED_data:
         )
         aggregated_df["returns"] = aggregated_df["last_value_per_month"].pct_change()
 
-        self.last_cleaned_df = {series_id: aggregated_df}
-
         return aggregated_df
 
     def get_FRED_data_observations(
@@ -115,6 +127,171 @@ class FRED_data:
         return df_interest_rates["last_value_per_month"].values[-1]
 
 
+def get_series_version(df_observations: pd.DataFrame | pd.Series) -> str:
+    """Changes whenever FRED publishes or revises the length of a series.
+
+    Use it to key anything derived from a series so it is recomputed once new
+    data arrives.
+    """
+    return f"{df_observations.index[-1]:%Y-%m-%d}:{len(df_observations)}"
+
+
+class FRED_observations_cache:
+    """Recently fetched observations, so repeated requests skip FRED.
+
+    Entries expire after ttl_in_seconds so newly published data is picked up,
+    and at most max_entries series are kept, least recently used first out.
+    The DataFrames are shared by every caller and must not be modified.
+    """
+
+    def __init__(
+        self,
+        data_service: FRED_data,
+        ttl_in_seconds: float = 300,
+        max_entries: int = 8,
+    ):
+        self.data_service = data_service
+        self.ttl_in_seconds = ttl_in_seconds
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, Tuple[float, pd.DataFrame]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get_FRED_data_observations(self, series_key_or_series_id: str) -> pd.DataFrame:
+        series_id = self.data_service.FRED_data_constants.get(
+            series_key_or_series_id, series_key_or_series_id
+        )
+        with self.lock:
+            cached = self.entries.get(series_id)
+            if cached is not None and time.monotonic() < cached[0]:
+                self.entries.move_to_end(series_id)
+                metrics.record_cache_lookup("fred_observations", hit=True)
+                return cached[1]
+
+        metrics.record_cache_lookup("fred_observations", hit=False)
+        # Fetched outside the lock so one slow series does not hold up others
+        df_observations = self.data_service.get_FRED_data_observations(
+            series_key_or_series_id=series_id
+        )
+        with self.lock:
+            self.entries[series_id] = (
+                time.monotonic() + self.ttl_in_seconds,
+                df_observations,
+            )
+            self.entries.move_to_end(series_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return df_observations
+
+
+class FRED_series_store:
+    """Several FRED series aligned onto one monthly calendar.
+
+    Weekly series such as MORTGAGE30US and monthly ones such as Case-Shiller
+    are reduced to their last value per month and joined on the months they
+    share. Levels and month over month returns are each kept as one contiguous
+    (months, series) array, and the rows where every series has a return are
+    precomputed, so a bootstrap draw is a single fancy index gather.
+    """
+
+    def __init__(
+        self,
+        data_service: FRED_data,
+        series_keys_or_series_ids: List[str] | None = None,
+    ):
+        self.data_service = data_service
+        self.series_ids: List[str] = []
+        # Series the arrays were built from, they are stale when it differs
+        # from series_ids. The lock keeps a load from publishing arrays half
+        # way while another thread registers a series or reads them.
+        self.loaded_series_ids: Tuple[str, ...] | None = None
+        self.lock = threading.Lock()
+
+        for series_key_or_series_id in series_keys_or_series_ids or []:
+            self.register(series_key_or_series_id)
+
+    def register(self, series_key_or_series_id: str) -> None:
+        series_id = self.data_service.FRED_data_constants.get(
+            series_key_or_series_id, series_key_or_series_id
+        )
+        with self.lock:
+            if series_id not in self.series_ids:
+                # A new list, so a load already reading the old one is unaffected
+                self.series_ids = self.series_ids + [series_id]
+
+    def load(self) -> None:
+        with self.lock:
+            series_ids = tuple(self.series_ids)
+
+        monthly_series = {
+            series_id: self.data_service.get_FRED_data_observations(
+                series_key_or_series_id=series_id
+            )["last_value_per_month"]
+            .resample("MS")
+            .last()
+            for series_id in series_ids
+        }
+        df_levels = pd.concat(monthly_series, axis=1, join="inner")
+
+        levels = np.ascontiguousarray(df_levels.to_numpy(dtype=float))
+        returns = np.full_like(levels, np.nan)
+        returns[1:] = levels[1:] / levels[:-1] - 1
+
+        sample_rows = np.flatnonzero(np.isfinite(returns).all(axis=1))
+        sample_returns = np.ascontiguousarray(returns[sample_rows])
+
+        # The arrays are shared by every simulation drawing from the store
+        for array in (levels, returns, sample_returns):
+            array.setflags(write=False)
+
+        with self.lock:
+            self.index = df_levels.index
+            self.levels = levels
+            self.returns = returns
+            self.sample_rows = sample_rows
+            self.sample_returns = sample_returns
+            self.loaded_series_ids = series_ids
+
+    def __load_if_stale(self) -> None:
+        with self.lock:
+            is_stale = self.loaded_series_ids != tuple(self.series_ids)
+        if is_stale:
+            self.load()
+
+    def get_levels(self) -> pd.DataFrame:
+        self.__load_if_stale()
+        with self.lock:
+            return pd.DataFrame(
+                self.levels, index=self.index, columns=list(self.loaded_series_ids)
+            )
+
+    def get_column(self, series_key_or_series_id: str) -> int:
+        """Column of a series in the levels and returns arrays.
+
+        Columns follow the order series were registered in. Registering only
+        appends, so a series keeps its column when the store reloads.
+        """
+        series_id = self.data_service.FRED_data_constants.get(
+            series_key_or_series_id, series_key_or_series_id
+        )
+        self.__load_if_stale()
+        with self.lock:
+            if series_id not in self.loaded_series_ids:
+                raise ValueError(f"{series_id} is not registered in this store")
+            return self.loaded_series_ids.index(series_id)
+
+    def get_sample_returns(self) -> np.ndarray:
+        """Rows of returns with no gaps, ready to pass to a joint bootstrap."""
+        self.__load_if_stale()
+        with self.lock:
+            return self.sample_returns
+
+    def get_most_recent_levels(self) -> np.ndarray:
+        self.__load_if_stale()
+        with self.lock:
+            return self.levels[-1]
+
+
 if __name__ == "__main__":
     api_key = os.getenv("FRED_API", "")
     data_service = FRED_data(API_key=api_key)
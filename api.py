@@ -1,38 +1,235 @@
+import asyncio
+import multiprocessing
 import os
-import pandas as pd
-from flask import Flask, jsonify, request
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import cache
+from typing import TYPE_CHECKING, Any
+
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 from dotenv import load_dotenv
 
+import metrics
+
 load_dotenv()
 print(f"--- API KEY LOADED: '{os.getenv('FRED_API')}' ---")
 
-import FRED_data_service
-import property_math
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+    import FRED_data_service
+    import property_math
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
 
-try:
-    fred_data_service = FRED_data_service.FRED_data(API_key=os.getenv("FRED_API", ""))
-except Exception as e:
-    print(f"Could not initialize FRED service:{e}")
-    fred_data_service = None
+
+# FRED_data_service and property_math pull in pandas, numpy and requests, so
+# they are imported on first use to keep cold starts fast.
+@cache
+def get_fred_data_service() -> "FRED_data_service.FRED_data | None":
+    import FRED_data_service
+
+    try:
+        return FRED_data_service.FRED_data(API_key=os.getenv("FRED_API", ""))
+    except Exception as e:
+        print(f"Could not initialize FRED service:{e}")
+        return None
+
+
+# Observations are kept for a few minutes, so a sweep of scenarios on one
+# series does not fetch and parse it from FRED for every request.
+FRED_OBSERVATIONS_TTL_IN_SECONDS = float(
+    os.getenv("FRED_OBSERVATIONS_TTL_IN_SECONDS", "300")
+)
+
+
+@cache
+def get_fred_observations_cache() -> "FRED_data_service.FRED_observations_cache":
+    import FRED_data_service
+
+    return FRED_data_service.FRED_observations_cache(
+        data_service=get_fred_data_service(),
+        ttl_in_seconds=FRED_OBSERVATIONS_TTL_IN_SECONDS,
+    )
+
+
+# CPU-heavy simulations run in a bounded process pool so they never hold up the
+# request threads that serve the fast endpoints. Requests beyond the pool size
+# plus the queue depth are rejected instead of piling up.
+MONTE_CARLO_WORKERS = int(os.getenv("MONTE_CARLO_WORKERS", str(os.cpu_count() or 1)))
+MONTE_CARLO_MAX_QUEUE = int(
+    os.getenv("MONTE_CARLO_MAX_QUEUE", str(MONTE_CARLO_WORKERS * 2))
+)
+
+monte_carlo_admission = threading.BoundedSemaphore(
+    MONTE_CARLO_WORKERS + MONTE_CARLO_MAX_QUEUE
+)
+
+
+@cache
+def get_monte_carlo_executor() -> ProcessPoolExecutor:
+    # Forking a threaded server can copy locks held by other threads into the
+    # worker, so workers are started from a clean forkserver (spawn on Windows).
+    start_method = (
+        "forkserver"
+        if "forkserver" in multiprocessing.get_all_start_methods()
+        else "spawn"
+    )
+    return ProcessPoolExecutor(
+        max_workers=MONTE_CARLO_WORKERS,
+        mp_context=multiprocessing.get_context(start_method),
+    )
+
+
+monte_carlo_executor_lock = threading.Lock()
+
+
+def replace_broken_monte_carlo_executor(executor: ProcessPoolExecutor) -> None:
+    # A worker killed from outside, for example by the OOM killer, breaks the
+    # whole pool. Only the first request to notice replaces it.
+    with monte_carlo_executor_lock:
+        if get_monte_carlo_executor() is executor:
+            get_monte_carlo_executor.cache_clear()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Simulations are run once per series version, sampler, seed and number of runs
+# as paths starting at 1 and answered for any property value and term by
+# scaling and slicing them. A fixed seed lets every request share the paths.
+MONTE_CARLO_SEED = int(os.getenv("MONTE_CARLO_SEED", "81007"))
+MONTE_CARLO_NUMBER_OF_RUNS = 100  # Keep runs low for faster API response
+
+
+@cache
+def get_monte_carlo_path_cache() -> "property_math.NormalizedPathCache":
+    import property_math
+
+    return property_math.NormalizedPathCache()
+
+
+# Longer terms would simulate, cache or backtest horizons no mortgage needs.
+MAX_TERM_IN_MONTHS = 50 * 12
+
+
+def parse_term_in_months(value: Any) -> int:
+    """termInMonths as whole months from 1 to MAX_TERM_IN_MONTHS, else ValueError."""
+    try:
+        term_in_months = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("termInMonths must be a whole number")
+    if not 1 <= term_in_months <= MAX_TERM_IN_MONTHS:
+        raise ValueError(f"termInMonths must be between 1 and {MAX_TERM_IN_MONTHS}")
+
+    return term_in_months
+
+
+def parse_positive_amount(value: Any, name: str) -> float:
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not amount > 0:
+        raise ValueError(f"{name} must be greater than 0")
+
+    return amount
+
+
+def parse_annual_rate_percentage(value: Any) -> float:
+    try:
+        annual_rate_percentage = float(value)
+    except (TypeError, ValueError):
+        raise ValueError("annualRate must be a number")
+    if not annual_rate_percentage > -100:
+        raise ValueError("annualRate must be greater than -100")
+
+    return annual_rate_percentage
+
+
+# Every combination of the affordability grids is solved at once, so their size
+# is capped to bound the memory a single request can allocate.
+MAX_AFFORDABILITY_GRID_SIZE = 1_000_000
+
+
+# Rolling growth of a price index only changes when FRED publishes a new
+# observation, so it is kept per series version.
+@cache
+def get_historical_growth_cache() -> "property_math.RollingGrowthCache":
+    import property_math
+
+    return property_math.RollingGrowthCache(max_entries=8)
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    # Send "X-Profile: 1" to get the span breakdown in a Server-Timing header.
+    g.spans = [] if request.headers.get("X-Profile") == "1" else None
+    metrics.set_span_collector(g.spans)
+
+
+@app.after_request
+def record_request_metrics(response):
+    duration = time.perf_counter() - g.request_start
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+
+    metrics.observe(
+        "mortgage_dash_api_request_duration_seconds",
+        duration,
+        help_text="Request latency by endpoint.",
+        endpoint=endpoint,
+        method=request.method,
+    )
+    metrics.increment(
+        "mortgage_dash_api_requests_total",
+        help_text="Requests by endpoint and status code.",
+        endpoint=endpoint,
+        method=request.method,
+        status=str(response.status_code),
+    )
+
+    if g.spans is not None:
+        response.headers["Server-Timing"] = ", ".join(
+            [
+                f"{name};dur={span_duration * 1000:.3f}"
+                for name, span_duration in g.spans
+            ]
+            + [f"total;dur={duration * 1000:.3f}"]
+        )
+
+    return response
+
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    return (
+        metrics.render_prometheus(),
+        200,
+        {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
 
 
 @app.route("/api/current-rate", methods=["GET"])
 def get_current_rate():
+    fred_data_service = get_fred_data_service()
     if not fred_data_service:
         return jsonify({"error": "FRED service not available"}), 500
     try:
         rate = fred_data_service.get_most_recent_interest_rate()
-        return jsonify({"rate": float(rate)})
+        with metrics.timed("api.serialize"):
+            return jsonify({"rate": float(rate)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/amortization", methods=["POST"])
 def get_amortization_schedule():
+    import property_math
+
     data = request.get_json()
 
     # Basic validation
@@ -49,13 +246,14 @@ def get_amortization_schedule():
         )
         df = mortgage.get_mortgage_ammortization()
         # Convert DataFrame to a list of dictionaries for JSON compatibility
-        return jsonify(df.to_dict("records"))
+        with metrics.timed("api.serialize"):
+            return jsonify(df.to_dict("records"))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @app.route("/api/monte-carlo", methods=["POST"])
-def get_monte_carlo_simulation():
+async def get_monte_carlo_simulation():
     data = request.get_json()
 
     # Define and check for the keys this endpoint actually needs
@@ -66,35 +264,278 @@ def get_monte_carlo_simulation():
         ), 400
 
     try:
-        # Get historical price data from FRED
-        df_sample_data = fred_data_service.get_FRED_data_observations(
-            series_key_or_series_id=data["priceIndexKey"]
+        term_in_months = parse_term_in_months(data["termInMonths"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        import FRED_data_service
+        import property_math
+
+        # Get historical price data from FRED without blocking the event loop
+        df_sample_data = await asyncio.to_thread(
+            get_fred_observations_cache().get_FRED_data_observations,
+            series_key_or_series_id=data["priceIndexKey"],
         )
-        df_sample_data["returns"] = df_sample_data["last_value_per_month"].pct_change()
         sample_data = df_sample_data["returns"].dropna()  # Drop NaN values
 
-        # Run the simulation using data from the request
-        monte_carlo_simulator = property_math.MonteCarloPropertyValue(
-            starting_property_value=float(data["propertyValue"]),
-            sample_data=sample_data,
-            length_of_each_run=int(data["termInMonths"]),
-            number_of_runs=100,  # Keep runs low for faster API response
+        property_value = float(data["propertyValue"])
+
+        path_cache_key = (
+            data["priceIndexKey"],
+            FRED_data_service.get_series_version(df_sample_data),
+            "bootstrap",
+            MONTE_CARLO_SEED,
+            MONTE_CARLO_NUMBER_OF_RUNS,
         )
+        paths = get_monte_carlo_path_cache().get(path_cache_key, term_in_months)
+
+        if paths is None:
+            if not monte_carlo_admission.acquire(blocking=False):
+                return (
+                    jsonify(
+                        {"error": "Too many simulations in progress, try again later"}
+                    ),
+                    503,
+                    {"Retry-After": "1"},
+                )
+
+            executor = get_monte_carlo_executor()
+            try:
+                with metrics.timed("monte_carlo.pool"):
+                    simulation = await asyncio.wrap_future(
+                        executor.submit(
+                            property_math.build_normalized_paths,
+                            sample_data=sample_data,
+                            seed=MONTE_CARLO_SEED,
+                            number_of_runs=MONTE_CARLO_NUMBER_OF_RUNS,
+                            max_length_of_each_run=max(
+                                term_in_months,
+                                property_math.MAX_CACHED_HORIZON_IN_MONTHS,
+                            ),
+                        )
+                    )
+            except BrokenProcessPool:
+                replace_broken_monte_carlo_executor(executor)
+                return (
+                    jsonify({"error": "Simulation workers restarted, try again"}),
+                    503,
+                    {"Retry-After": "1"},
+                )
+            finally:
+                monte_carlo_admission.release()
 
-        df_sim = monte_carlo_simulator.generate_sample_data()
+            for name, span_duration in simulation["spans"]:
+                metrics.record_span(name, span_duration)
+            paths = simulation["paths"]
+            get_monte_carlo_path_cache().put(path_cache_key, paths)
 
         # Process the results for a clean JSON response
-        df_sim_T = df_sim.drop(columns="period").transpose()
-        results = {
-            "periods": df_sim["period"].tolist(),
-            "median": df_sim_T.median().tolist(),
-            "quantile_25": df_sim_T.quantile(0.25).tolist(),
-            "quantile_75": df_sim_T.quantile(0.75).tolist(),
-            # Optionally, include a few raw runs for visualization
-            "runs": df_sim.iloc[:, 1:6].to_dict("list"),  # First 5 runs
-        }
+        with metrics.timed("monte_carlo.aggregate"):
+            quantile_values = paths.quantile_values(
+                starting_property_value=property_value,
+                length_of_each_run=term_in_months,
+            )
+            results = {
+                "periods": list(range(term_in_months + 1)),
+                "median": quantile_values[0.5].tolist(),
+                "quantile_25": quantile_values[0.25].tolist(),
+                "quantile_75": quantile_values[0.75].tolist(),
+                # Optionally, include a few raw runs for visualization
+                "runs": {
+                    run: (
+                        paths.paths[run, : term_in_months + 1] * property_value
+                    ).tolist()
+                    for run in range(5)  # First 5 runs
+                },
+            }
 
-        return jsonify(results)
+        with metrics.timed("api.serialize"):
+            return jsonify(results)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def get_historical_growth(
+    series_id: str, price_index: "pd.Series", number_of_periods: int
+) -> "np.ndarray":
+    import FRED_data_service
+    import property_math
+
+    growth_cache_key = (series_id, FRED_data_service.get_series_version(price_index))
+    compounded_growth = get_historical_growth_cache().get(
+        growth_cache_key, number_of_periods
+    )
+    if compounded_growth is not None:
+        return compounded_growth
+
+    with metrics.timed("backtest.rolling_growth"):
+        compounded_growth = property_math.rolling_compounded_growth(
+            price_index,
+            max(number_of_periods, property_math.MAX_CACHED_HORIZON_IN_MONTHS),
+        )
+    # Shared by every request for this series, so it must not be modified
+    compounded_growth.setflags(write=False)
+    get_historical_growth_cache().put(growth_cache_key, compounded_growth)
+
+    return compounded_growth
+
+
+@app.route("/api/historical-backtest", methods=["POST"])
+def get_historical_backtest():
+    import property_math
+
+    data = request.get_json()
+    required_keys = [
+        "loanAmount",
+        "propertyValue",
+        "annualRate",
+        "termInMonths",
+        "priceIndexKey",
+    ]
+    if not all(key in data for key in required_keys):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    try:
+        term_in_months = parse_term_in_months(data["termInMonths"])
+        loan_amount = parse_positive_amount(data["loanAmount"], "loanAmount")
+        property_value = parse_positive_amount(data["propertyValue"], "propertyValue")
+        annual_rate_percentage = parse_annual_rate_percentage(data["annualRate"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        df_price_index = get_fred_observations_cache().get_FRED_data_observations(
+            series_key_or_series_id=data["priceIndexKey"]
+        )
+        # Observations are per date, so a weekly or daily index is reduced to
+        # one value a month like FRED_series_store does. A month with no
+        # observation holds the previous value instead of shifting the months.
+        price_index = (
+            df_price_index["last_value_per_month"].resample("MS").last().ffill()
+        )
+        if term_in_months >= len(price_index.dropna()):
+            return jsonify(
+                {
+                    "error": f"A {term_in_months} month term is longer than the "
+                    f"{len(price_index.dropna()) - 1} months of "
+                    f"{data['priceIndexKey']} history"
+                }
+            ), 400
+
+        mortgage = property_math.Mortgage(
+            annual_rate_percentage=annual_rate_percentage,
+            number_of_periods_for_loan_term=term_in_months,
+            loan_amount=loan_amount,
+            property_value=property_value,
+        )
+        backtest = property_math.HistoricalEquityBacktest(
+            mortgage=mortgage,
+            price_index=price_index,
+            compounded_growth=get_historical_growth(
+                series_id=data["priceIndexKey"],
+                price_index=price_index,
+                number_of_periods=term_in_months,
+            ),
+        )
+
+        with metrics.timed("backtest.outcomes"):
+            df_summary = backtest.summary_by_period()
+            df_outcomes = backtest.outcomes_at_horizon()
+        df_outcomes["start_date"] = df_outcomes["start_date"].dt.strftime("%Y-%m-%d")
+
+        with metrics.timed("api.serialize"):
+            return jsonify(
+                {
+                    # NaN is not valid JSON, periods no start date reached are null
+                    "summary": df_summary.astype(object)
+                    .where(df_summary.notna(), None)
+                    .to_dict("list"),
+                    "outcomes": df_outcomes.to_dict("records"),
+                }
+            )
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/affordability", methods=["POST"])
+def get_affordability():
+    import numpy as np
+
+    import property_math
+
+    data = request.get_json()
+    # Every grid accepts a single value or a list of values
+    required_keys = ["targetPayments", "annualRates"]
+    if not all(key in data for key in required_keys):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    axes = {
+        "targetPayments": data["targetPayments"],
+        "annualRates": data["annualRates"],
+        "termsInMonths": data.get("termsInMonths", [15 * 12, 30 * 12]),
+        "downPaymentPercentages": data.get("downPaymentPercentages", 20),
+    }
+    for name, values in axes.items():
+        try:
+            axes[name] = np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            axes[name] = None
+        if axes[name] is None or axes[name].ndim > 1 or np.isnan(axes[name]).any():
+            return jsonify(
+                {"error": f"{name} must be a number or a flat list of numbers"}
+            ), 400
+
+    if (axes["termsInMonths"] < 1).any():
+        return jsonify({"error": "termsInMonths must be at least 1"}), 400
+    if (axes["annualRates"] <= -100).any():
+        return jsonify({"error": "annualRates must be greater than -100"}), 400
+    if (
+        (axes["downPaymentPercentages"] < 0) | (axes["downPaymentPercentages"] > 100)
+    ).any():
+        return jsonify(
+            {"error": "downPaymentPercentages must be between 0 and 100"}
+        ), 400
+
+    try:
+        grid_size = int(np.prod([np.size(values) for values in axes.values()]))
+        if grid_size > MAX_AFFORDABILITY_GRID_SIZE:
+            return jsonify(
+                {
+                    "error": f"Grid has {grid_size} combinations, the limit is "
+                    f"{MAX_AFFORDABILITY_GRID_SIZE}"
+                }
+            ), 400
+
+        affordability = property_math.solve_max_affordable_price(
+            target_monthly_payments=axes["targetPayments"],
+            annual_rate_percentages=axes["annualRates"],
+            number_of_periods_for_loan_terms=axes["termsInMonths"],
+            down_payment_percentages=axes["downPaymentPercentages"],
+            property_tax_rate_percentage=float(data.get("propertyTaxRate", 0)),
+            annual_insurance=float(data.get("annualInsurance", 0)),
+        )
+
+        with metrics.timed("api.serialize"):
+            return jsonify(
+                {
+                    # Results are indexed [payment][rate][term][down payment]
+                    "axes": {
+                        name: [float(value) for value in np.atleast_1d(values)]
+                        for name, values in axes.items()
+                    },
+                    # NaN is not valid JSON, combinations with no maximum are null
+                    **{
+                        name: np.where(np.isnan(values), None, values.round(2)).tolist()
+                        for name, values in (
+                            ("maxLoanAmount", affordability["max_loan_amount"]),
+                            ("maxPurchasePrice", affordability["max_purchase_price"]),
+                        )
+                    },
+                }
+            )
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -102,6 +543,8 @@ def get_monte_carlo_simulation():
 
 @app.route("/api/mortgage-options", methods=["POST"])
 def get_mortgage_options():
+    import property_math
+
     data = request.get_json()
     required_keys = ["loanAmount", "annualRate", "termInMonths"]
     if not all(key in data for key in required_keys):
@@ -144,7 +587,8 @@ def get_mortgage_options():
             "data": table_data,
         }
 
-        return jsonify(response_data)
+        with metrics.timed("api.serialize"):
+            return jsonify(response_data)
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
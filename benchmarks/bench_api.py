@@ -0,0 +1,73 @@
+"""End-to-end benchmarks of the api.py endpoints through the Flask test client."""
+
+from typing import Any, Callable, Dict
+
+import api
+
+MONTE_CARLO_PAYLOAD = {
+    "propertyValue": 600000,
+    "termInMonths": 360,
+    "priceIndexKey": "CSUSHPISA",
+}
+
+
+def endpoint_benchmark(
+    method: str,
+    path: str,
+    payload: Dict[str, Any] | None = None,
+    before_each_call: Callable[[], Any] | None = None,
+) -> Callable[[], Any]:
+    client = api.app.test_client()
+
+    def call_endpoint():
+        if before_each_call is not None:
+            before_each_call()
+        response = client.open(path, method=method, json=payload)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        return response
+
+    return call_endpoint
+
+
+def benchmarks() -> Dict[str, Callable[[], Any]]:
+    return {
+        "api[GET /api/current-rate]": endpoint_benchmark("GET", "/api/current-rate"),
+        "api[POST /api/amortization]": endpoint_benchmark(
+            "POST",
+            "/api/amortization",
+            {
+                "loanAmount": 500000,
+                "propertyValue": 600000,
+                "annualRate": 6.5,
+                "termInMonths": 360,
+            },
+        ),
+        "api[POST /api/affordability]": endpoint_benchmark(
+            "POST",
+            "/api/affordability",
+            {
+                "targetPayments": list(range(1000, 10001, 250)),
+                "annualRates": [rate / 4 for rate in range(8, 49)],
+                "termsInMonths": [180, 360],
+                "downPaymentPercentages": 20,
+                "propertyTaxRate": 1.2,
+                "annualInsurance": 1800,
+            },
+        ),
+        "api[POST /api/mortgage-options]": endpoint_benchmark(
+            "POST",
+            "/api/mortgage-options",
+            {"loanAmount": 500000, "annualRate": 6.5, "termInMonths": 360},
+        ),
+        # After warmup the simulated paths are cached, so this times cache hits
+        "api[POST /api/monte-carlo]": endpoint_benchmark(
+            "POST", "/api/monte-carlo", MONTE_CARLO_PAYLOAD
+        ),
+        # Clearing the cache first sends every call through the process pool
+        "api[POST /api/monte-carlo cold]": endpoint_benchmark(
+            "POST",
+            "/api/monte-carlo",
+            MONTE_CARLO_PAYLOAD,
+            before_each_call=api.get_monte_carlo_path_cache().clear,
+        ),
+    }
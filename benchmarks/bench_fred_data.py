@@ -0,0 +1,50 @@
+"""Benchmarks for parsing and cleaning FRED observations in FRED_data_service."""
+
+from typing import Any, Callable, Dict
+
+import FRED_data_service
+import fred_stub
+
+
+def load_and_clean_benchmark(number_of_observations: int) -> Callable[[], Any]:
+    data_service = FRED_data_service.FRED_data(API_key="")
+    # Daily, so even 100k observations end before pandas' last timestamp in
+    # 2262 and every one of them is parsed
+    json_response = fred_stub.synthesize_observations(
+        series_id="CSUSHPISA",
+        number_of_observations=number_of_observations,
+        frequency="D",
+    )
+
+    return lambda: data_service._FRED_data__load_and_clean_df(
+        json_response=json_response, series_id="CSUSHPISA"
+    )
+
+
+def observations_benchmark(series_id: str) -> Callable[[], Any]:
+    """Request, JSON decoding and cleaning against the offline stub."""
+    data_service = FRED_data_service.FRED_data(API_key="")
+
+    def get_observations():
+        with fred_stub.offline_fred():
+            return data_service.get_FRED_data_observations(
+                series_key_or_series_id=series_id
+            )
+
+    return get_observations
+
+
+def benchmarks() -> Dict[str, Callable[[], Any]]:
+    suite = {}
+
+    for number_of_observations in (1000, 10000, 100000):
+        suite[f"load_and_clean_df[observations={number_of_observations}]"] = (
+            load_and_clean_benchmark(number_of_observations)
+        )
+
+    for series_id in ("MORTGAGE30US", "CSUSHPISA"):
+        suite[f"get_FRED_data_observations[{series_id}]"] = observations_benchmark(
+            series_id
+        )
+
+    return suite
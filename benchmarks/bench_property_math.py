@@ -0,0 +1,174 @@
+"""Benchmarks for the amortization, payment and Monte Carlo math in property_math."""
+
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+import FRED_data_service
+import fred_stub
+import property_math
+
+
+def amortization_benchmark(term_in_months: int) -> Callable[[], Any]:
+    mortgage = property_math.Mortgage(
+        annual_rate_percentage=6.5,
+        number_of_periods_for_loan_term=term_in_months,
+        loan_amount=500000,
+        property_value=600000,
+    )
+
+    return lambda: property_math.generate_mortgage_amortization_table(
+        annual_rate_percentage=mortgage.annual_rate_percentage,
+        number_of_periods_per_compounding_term=mortgage.number_of_periods_per_compounding_term,
+        loan_amount=mortgage.loan_amount,
+        mortgage_payment=mortgage.mortgage_payment,
+        property_value=mortgage.property_value,
+    )
+
+
+def payment_grid_benchmark(number_of_rates: int) -> Callable[[], Any]:
+    """The rate by term grid api.py and the dash app build for every request."""
+    rates = np.linspace(2, 12, number_of_rates) / 100 / 12
+    terms = [15 * 12, 20 * 12, 30 * 12]
+
+    def payment_grid():
+        return [
+            property_math.calculate_mortgage_payment(
+                effective_interest_rate_per_compounding_period=rate,
+                number_of_periods_for_loan_term=term,
+                loan_amount=500000,
+            )
+            for term in terms
+            for rate in rates
+        ]
+
+    return payment_grid
+
+
+def affordability_benchmark(grid_size: int) -> Callable[[], Any]:
+    """A grid_size x grid_size payment by rate heatmap for two terms."""
+    target_payments = np.linspace(1000, 10000, grid_size)
+    rates = np.linspace(2, 12, grid_size)
+
+    return lambda: property_math.solve_max_affordable_price(
+        target_monthly_payments=target_payments,
+        annual_rate_percentages=rates,
+        number_of_periods_for_loan_terms=[15 * 12, 30 * 12],
+        down_payment_percentages=20,
+        property_tax_rate_percentage=1.2,
+        annual_insurance=1800,
+    )
+
+
+def monte_carlo_benchmark(number_of_runs: int) -> Callable[[], Any]:
+    with fred_stub.offline_fred():
+        sample_data = FRED_data_service.FRED_data(
+            API_key=""
+        ).get_FRED_data_observations(series_key_or_series_id="CSUSHPISA")["returns"]
+
+    def simulate():
+        monte_carlo = property_math.MonteCarloPropertyValue(
+            starting_property_value=500000,
+            sample_data=sample_data,
+            seed=81007,
+            number_of_runs=number_of_runs,
+        )
+        return monte_carlo.summary_results()
+
+    return simulate
+
+
+def normalized_path_sweep_benchmark(number_of_scenarios: int) -> Callable[[], Any]:
+    """Quantile bands for many property values and terms from cached paths."""
+    with fred_stub.offline_fred():
+        sample_data = FRED_data_service.FRED_data(
+            API_key=""
+        ).get_FRED_data_observations(series_key_or_series_id="CSUSHPISA")["returns"]
+    paths = property_math.NormalizedPropertyValuePaths(
+        sample_data=sample_data, seed=81007, number_of_runs=1000
+    )
+    property_values = np.linspace(200000, 1000000, number_of_scenarios)
+    terms = np.resize([120, 180, 240, 360, 480], number_of_scenarios)
+
+    return lambda: [
+        paths.quantile_values(
+            starting_property_value=property_value, length_of_each_run=term
+        )
+        for property_value, term in zip(property_values, terms)
+    ]
+
+
+def joint_monte_carlo_benchmark(number_of_runs: int) -> Callable[[], Any]:
+    """Bootstrap of whole months of Case-Shiller returns and mortgage rates."""
+    with fred_stub.offline_fred():
+        series_store = FRED_data_service.FRED_series_store(
+            data_service=FRED_data_service.FRED_data(API_key=""),
+            series_keys_or_series_ids=["CSUSHPISA", "MORTGAGE30US"],
+        )
+        series_store.load()
+
+    def simulate():
+        monte_carlo = property_math.MonteCarloPropertyValue(
+            starting_property_value=500000,
+            sample_data=series_store.get_sample_returns(),
+            seed=81007,
+            number_of_runs=number_of_runs,
+            price_series_column=series_store.get_column("CSUSHPISA"),
+            joint_starting_values=series_store.get_most_recent_levels(),
+        )
+        return monte_carlo.summary_results()
+
+    return simulate
+
+
+def pool_cash_flows_benchmark(number_of_loans: int) -> Callable[[], Any]:
+    random_number_generator = np.random.default_rng(seed=81007)
+    pool = property_math.MortgagePoolCashFlows(
+        loan_amounts=random_number_generator.uniform(100000, 800000, number_of_loans),
+        annual_rate_percentages=random_number_generator.uniform(3, 8, number_of_loans),
+        number_of_periods_for_loan_term=360,
+        loan_age_in_months=random_number_generator.integers(0, 60, number_of_loans),
+    )
+
+    return lambda: pool.pool_cash_flows(pool.psa_smm(psa_speed=150))
+
+
+def benchmarks() -> Dict[str, Callable[[], Any]]:
+    suite = {}
+
+    for term_in_months in (60, 180, 360, 480):
+        suite[f"amortization_table[term={term_in_months}]"] = amortization_benchmark(
+            term_in_months
+        )
+
+    for number_of_rates in (9, 100, 1000):
+        suite[f"payment_grid[rates={number_of_rates}]"] = payment_grid_benchmark(
+            number_of_rates
+        )
+
+    for grid_size in (10, 100, 1000):
+        suite[f"affordability[grid={grid_size}x{grid_size}]"] = affordability_benchmark(
+            grid_size
+        )
+
+    for number_of_runs in (100, 1000, 5000):
+        suite[f"monte_carlo[runs={number_of_runs}]"] = monte_carlo_benchmark(
+            number_of_runs
+        )
+
+    for number_of_scenarios in (1, 100):
+        suite[f"normalized_path_sweep[scenarios={number_of_scenarios}]"] = (
+            normalized_path_sweep_benchmark(number_of_scenarios)
+        )
+
+    for number_of_runs in (1000, 5000):
+        suite[f"monte_carlo_joint[runs={number_of_runs}]"] = (
+            joint_monte_carlo_benchmark(number_of_runs)
+        )
+
+    for number_of_loans in (1000, 10000):
+        suite[f"pool_cash_flows[loans={number_of_loans}]"] = pool_cash_flows_benchmark(
+            number_of_loans
+        )
+
+    return suite
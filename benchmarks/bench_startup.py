@@ -0,0 +1,92 @@
+"""Cold-start benchmark: time to import each app and serve its first response.
+
+Every sample runs in a fresh interpreter so module caches do not carry over.
+
+    python benchmarks/bench_startup.py --repeat 5 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Each snippet prints the import and first response times in seconds as JSON.
+# os._exit skips waiting on background threads such as the FRED rate fetch.
+STARTUP_SNIPPETS = {
+    "api": """
+import json, os, time
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+response = api.app.test_client().post(
+    "/api/mortgage-options",
+    json={"loanAmount": 500000, "annualRate": 6.5, "termInMonths": 360},
+)
+assert response.status_code == 200, response.status_code
+responded = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_response": responded - imported}))
+os._exit(0)
+""",
+    "dashapp_mortgage_ammortization": """
+import json, os, time
+start = time.perf_counter()
+import dashapp_mortgage_ammortization
+imported = time.perf_counter()
+response = dashapp_mortgage_ammortization.app.server.test_client().get("/")
+assert response.status_code == 200, response.status_code
+responded = time.perf_counter()
+print(json.dumps({"import": imported - start, "first_response": responded - imported}))
+os._exit(0)
+""",
+}
+
+
+def time_startup(snippet: str) -> Dict[str, float]:
+    completed = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=REPO_ROOT,
+        env={**os.environ, "PYTHONPATH": str(REPO_ROOT)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "max": max(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for name, snippet in STARTUP_SNIPPETS.items():
+        samples = [time_startup(snippet) for _ in range(args.repeat)]
+        results[name] = {
+            phase: summarize([sample[phase] for sample in samples])
+            for phase in ("import", "first_response")
+        }
+
+    report = json.dumps(results, indent=2)
+    if args.output is not None:
+        args.output.write_text(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
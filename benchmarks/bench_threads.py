@@ -0,0 +1,357 @@
+"""Thread safety checks and a thread scaling benchmark for the computation core.
+
+The precision check builds amortization tables for a small, a very large and
+again the small loan one after another in this process and compares each with
+a table built in a fresh interpreter, so nothing left over from an earlier call
+can change a later one. The stress test then has many threads hammer the state
+that really is shared between requests: a FRED_series_store that threads
+register series in while others read it, a NormalizedPathCache, a KeyedLock and
+one FRED_data instance. The scaling benchmark times the NumPy heavy paths with
+1, 2, 4 and 8 threads.
+
+    python benchmarks/bench_threads.py --output threads.json
+
+The exit code is 1 when any check fails.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import pickle
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+
+import numpy as np  # noqa: E402
+
+import FRED_data_service  # noqa: E402
+import fred_stub  # noqa: E402
+import keyed_lock  # noqa: E402
+import property_math  # noqa: E402
+
+THREAD_COUNTS = (1, 2, 4, 8)
+SERIES_IDS = ("MORTGAGE30US", "CSUSHPISA", "CSUSHPINSA")
+
+
+def amortization_table(loan_amount: float) -> Any:
+    mortgage = property_math.Mortgage(
+        annual_rate_percentage=6.5,
+        number_of_periods_for_loan_term=360,
+        loan_amount=loan_amount,
+        property_value=loan_amount * 1.25,
+    )
+    return mortgage.get_mortgage_ammortization()
+
+
+def fresh_process_amortization_table(loan_amount: float) -> Any:
+    completed = subprocess.run(
+        [sys.executable, __file__, "--fresh-table", str(loan_amount)],
+        capture_output=True,
+        check=True,
+    )
+    return pickle.loads(completed.stdout)
+
+
+def precision_check() -> List[str]:
+    """Tables built one after another must match ones built in a fresh process."""
+    failures = []
+    for loan_amount in (9000, 48000000, 9000):
+        name = f"amortization_table[{loan_amount:g}]"
+        try:
+            table = amortization_table(loan_amount)
+        except Exception as e:
+            failures.append(f"{name}: raised {e!r}")
+            continue
+        if not table.equals(fresh_process_amortization_table(loan_amount)):
+            failures.append(f"{name}: differs from a fresh process")
+
+    return failures
+
+
+def run_concurrently(
+    number_of_threads: int, func: Callable[[int], List[str]]
+) -> List[str]:
+    """Start func on every thread at the same moment and gather its failures."""
+    barrier = threading.Barrier(number_of_threads)
+
+    def run(thread_number: int) -> List[str]:
+        barrier.wait()
+        try:
+            return func(thread_number)
+        except Exception as e:
+            return [f"{func.__name__}: raised {e!r}"]
+
+    with ThreadPoolExecutor(max_workers=number_of_threads) as executor:
+        return [
+            failure
+            for failures in executor.map(run, range(number_of_threads))
+            for failure in failures
+        ]
+
+
+def stress_series_store(number_of_threads: int, rounds: int) -> List[str]:
+    """Register series in a shared store while other threads read it."""
+    data_service = FRED_data_service.FRED_data(API_key="")
+    # Threads register the other series in any order, so every combination
+    # that includes the first one can be seen.
+    references = {}
+    for number_of_other_series in range(len(SERIES_IDS)):
+        for other_series_ids in itertools.combinations(
+            SERIES_IDS[1:], number_of_other_series
+        ):
+            series_ids = [SERIES_IDS[0], *other_series_ids]
+            references[frozenset(series_ids)] = FRED_data_service.FRED_series_store(
+                data_service, series_ids
+            ).get_levels()[series_ids]
+
+    failures = []
+    for _ in range(rounds):
+        series_store = FRED_data_service.FRED_series_store(
+            data_service, [SERIES_IDS[0]]
+        )
+
+        def check_levels() -> List[str]:
+            df_levels = series_store.get_levels()
+            series_ids = [
+                series_id for series_id in SERIES_IDS if series_id in df_levels
+            ]
+            reference = references.get(frozenset(df_levels.columns))
+            if reference is None or not df_levels[series_ids].equals(reference):
+                return [
+                    f"series_store.get_levels: {list(df_levels.columns)} does not "
+                    "match a single threaded load of those series"
+                ]
+            return []
+
+        def series_store_worker(thread_number: int) -> List[str]:
+            failures = check_levels()
+            # Registering after a read lands while other threads are loading
+            if thread_number % 4 == 0:
+                series_store.register(SERIES_IDS[1 + thread_number // 4 % 2])
+            return failures + check_levels()
+
+        failures += run_concurrently(number_of_threads, series_store_worker)
+
+    return failures
+
+
+def stress_path_cache(number_of_threads: int, rounds: int) -> List[str]:
+    """Put and get from a shared cache small enough to evict all the time."""
+    paths_by_key = {
+        key: property_math.NormalizedPropertyValuePaths(
+            sample_data=np.full(24, 0.003),
+            seed=key,
+            number_of_runs=10,
+            max_length_of_each_run=24,
+        )
+        for key in range(12)
+    }
+    path_cache = property_math.NormalizedPathCache(max_entries=4)
+
+    def path_cache_worker(thread_number: int) -> List[str]:
+        failures = []
+        random_number_generator = np.random.default_rng(seed=thread_number)
+        for key in random_number_generator.integers(len(paths_by_key), size=rounds):
+            key = int(key)
+            paths = path_cache.get(key, 12)
+            if paths is None:
+                path_cache.put(key, paths_by_key[key])
+            elif paths is not paths_by_key[key]:
+                failures.append(f"NormalizedPathCache.get({key}): wrong entry")
+        return failures
+
+    failures = run_concurrently(number_of_threads, path_cache_worker)
+    if len(path_cache.entries) > path_cache.max_entries:
+        failures.append(
+            f"NormalizedPathCache: {len(path_cache.entries)} entries, "
+            f"the limit is {path_cache.max_entries}"
+        )
+
+    return failures
+
+
+def stress_keyed_lock(number_of_threads: int, rounds: int) -> List[str]:
+    """No two threads may hold the lock for the same key at once."""
+    computation_locks = keyed_lock.KeyedLock()
+    holders = {key: 0 for key in range(3)}
+    counter_lock = threading.Lock()
+
+    def keyed_lock_worker(thread_number: int) -> List[str]:
+        failures = []
+        for round_number in range(rounds):
+            key = (thread_number + round_number) % len(holders)
+            with computation_locks.hold(key):
+                with counter_lock:
+                    holders[key] += 1
+                    if holders[key] > 1:
+                        failures.append(f"KeyedLock: key {key} held twice")
+                time.sleep(0)
+                with counter_lock:
+                    holders[key] -= 1
+        return failures
+
+    failures = run_concurrently(number_of_threads, keyed_lock_worker)
+    if computation_locks._locks:
+        failures.append(f"KeyedLock: {len(computation_locks._locks)} locks left over")
+
+    return failures
+
+
+def stress_fred_data(number_of_threads: int, rounds: int) -> List[str]:
+    """Parse every series from one FRED_data instance on every thread."""
+    data_service = FRED_data_service.FRED_data(API_key="")
+    references = {
+        series_id: data_service.get_FRED_data_observations(
+            series_key_or_series_id=series_id
+        )
+        for series_id in SERIES_IDS
+    }
+
+    def fred_data_worker(thread_number: int) -> List[str]:
+        failures = []
+        for round_number in range(rounds):
+            series_id = SERIES_IDS[(thread_number + round_number) % len(SERIES_IDS)]
+            df_observations = data_service.get_FRED_data_observations(
+                series_key_or_series_id=series_id
+            )
+            if not df_observations.equals(references[series_id]):
+                failures.append(f"get_FRED_data_observations[{series_id}]: differs")
+        return failures
+
+    return run_concurrently(number_of_threads, fred_data_worker)
+
+
+def stress_test(number_of_threads: int, rounds: int) -> List[str]:
+    # Switching threads far more often than the default 5 ms makes races show
+    # up even on a single core.
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        return (
+            stress_series_store(number_of_threads, rounds)
+            + stress_path_cache(number_of_threads, rounds * 50)
+            + stress_keyed_lock(number_of_threads, rounds * 50)
+            + stress_fred_data(number_of_threads, max(rounds // 10, 1))
+        )
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+
+def scaling_workloads() -> Dict[str, Callable[[], Any]]:
+    random_number_generator = np.random.default_rng(seed=81007)
+    sample_data = random_number_generator.normal(0.003, 0.01, 450)
+    price_index = 100 * np.cumprod(1 + sample_data)
+    pool = property_math.MortgagePoolCashFlows(
+        loan_amounts=random_number_generator.uniform(100000, 800000, 2000),
+        annual_rate_percentages=random_number_generator.uniform(3, 8, 2000),
+        number_of_periods_for_loan_term=360,
+    )
+
+    return {
+        "monte_carlo[runs=2000]": lambda: property_math.MonteCarloPropertyValue(
+            starting_property_value=500000,
+            sample_data=sample_data,
+            seed=81007,
+            number_of_runs=2000,
+        ).generate_sample_data(),
+        "pool_cash_flows[loans=2000]": lambda: pool.project_cash_flows(
+            pool.psa_smm(psa_speed=150)
+        ),
+        "rolling_compounded_growth[months=450]": lambda: (
+            property_math.rolling_compounded_growth(price_index, 360)
+        ),
+        "affordability[grid=400x400]": lambda: property_math.solve_max_affordable_price(
+            target_monthly_payments=np.linspace(1000, 10000, 400),
+            annual_rate_percentages=np.linspace(2, 12, 400),
+            number_of_periods_for_loan_terms=[180, 360],
+            down_payment_percentages=[5, 10, 20],
+        ),
+    }
+
+
+def measure_throughput(
+    func: Callable[[], Any], number_of_threads: int, calls: int
+) -> float:
+    with ThreadPoolExecutor(max_workers=number_of_threads) as executor:
+        # Warm up every thread before timing
+        list(executor.map(lambda _: func(), range(number_of_threads)))
+
+        start = time.perf_counter()
+        list(executor.map(lambda _: func(), range(calls)))
+        return calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--stress-threads", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--output", type=Path, default=None)
+    # Used by the precision check to build a table in a fresh interpreter
+    parser.add_argument("--fresh-table", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.fresh_table is not None:
+        sys.stdout.buffer.write(pickle.dumps(amortization_table(args.fresh_table)))
+        return
+
+    failures = precision_check()
+    print(f"precision check: {len(failures)} tables differ from a fresh process")
+    with fred_stub.offline_fred():
+        stress_failures = stress_test(args.stress_threads, args.rounds)
+    print(f"stress test: {len(stress_failures)} failures")
+    failures += stress_failures
+    for failure in failures[:20]:
+        print(f"FAILED {failure}")
+
+    # Speedups are bounded by the cores available, report them alongside
+    print(f"thread scaling on {os.cpu_count()} CPUs")
+    scaling = {}
+    for name, func in scaling_workloads().items():
+        throughputs = {
+            number_of_threads: measure_throughput(func, number_of_threads, args.calls)
+            for number_of_threads in THREAD_COUNTS
+        }
+        scaling[name] = {
+            str(number_of_threads): {
+                "throughput_per_second": throughput,
+                "speedup": throughput / throughputs[1],
+            }
+            for number_of_threads, throughput in throughputs.items()
+        }
+        print(
+            f"{name:<40} "
+            + "  ".join(
+                f"{number_of_threads}t {throughput / throughputs[1]:4.2f}x"
+                for number_of_threads, throughput in throughputs.items()
+            )
+        )
+
+    if args.output is not None:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "cpu_count": os.cpu_count(),
+                    "failures": failures,
+                    "scaling": scaling,
+                },
+                indent=2,
+            )
+        )
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Offline stand-in for the FRED API used by the benchmarks.
+
+Observations are served from recorded responses in benchmarks/fixtures/<series_id>.json.
+Series without a fixture get a deterministic synthetic series in the same JSON
+shape, so the benchmarks run without an API key or network access.
+
+Record fresh fixtures from the real API (needs FRED_API to be set) with:
+
+    python benchmarks/fred_stub.py record MORTGAGE30US CSUSHPISA CSUSHPINSA
+"""
+
+import json
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import requests
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# Start date and pandas frequency used when a series has to be synthesized.
+SYNTHETIC_SERIES_SHAPES = {
+    "MORTGAGE30US": ("1971-04-02", "W-FRI"),
+    "CSUSHPISA": ("1987-01-01", "MS"),
+    "CSUSHPINSA": ("1987-01-01", "MS"),
+}
+
+
+def synthesize_observations(
+    series_id: str,
+    number_of_observations: int | None = None,
+    start: str | None = None,
+    frequency: str | None = None,
+) -> Dict[str, Any]:
+    """Build a FRED style observations payload with a seeded random walk.
+
+    start and frequency default to the series' shape in SYNTHETIC_SERIES_SHAPES.
+    """
+    default_start, default_frequency = SYNTHETIC_SERIES_SHAPES.get(
+        series_id, ("1987-01-01", "MS")
+    )
+    start = start or default_start
+    frequency = frequency or default_frequency
+    if number_of_observations is None:
+        dates = pd.date_range(start=start, end="2025-06-01", freq=frequency)
+    else:
+        dates = pd.date_range(
+            start=start, periods=number_of_observations, freq=frequency
+        )
+
+    random_number_generator = np.random.default_rng(
+        seed=sum(series_id.encode()) + len(dates)
+    )
+    if series_id == "MORTGAGE30US":
+        values = np.clip(
+            7 + np.cumsum(random_number_generator.normal(0, 0.08, len(dates))), 2, 18
+        )
+    else:
+        values = 60 * np.cumprod(
+            1 + random_number_generator.normal(0.003, 0.008, len(dates))
+        )
+
+    observations = [
+        {
+            "realtime_start": "2025-06-01",
+            "realtime_end": "2025-06-01",
+            "date": date,
+            "value": f"{value:.3f}",
+        }
+        for date, value in zip(dates.strftime("%Y-%m-%d"), values)
+    ]
+    # FRED reports missing observations as "."
+    for missing in range(7, len(observations), 97):
+        observations[missing]["value"] = "."
+
+    return {
+        "realtime_start": "2025-06-01",
+        "realtime_end": "2025-06-01",
+        "observation_start": observations[0]["date"] if observations else start,
+        "observation_end": observations[-1]["date"] if observations else start,
+        "units": "lin",
+        "file_type": "json",
+        "order_by": "observation_date",
+        "sort_order": "asc",
+        "count": len(observations),
+        "offset": 0,
+        "limit": 100000,
+        "observations": observations,
+    }
+
+
+def load_observations(series_id: str) -> Dict[str, Any]:
+    fixture = FIXTURES_DIR / f"{series_id}.json"
+    if fixture.exists():
+        return json.loads(fixture.read_text())
+
+    return synthesize_observations(series_id=series_id)
+
+
+def make_response(url: str, payload: Dict[str, Any]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response.encoding = "utf-8"
+    response._content = json.dumps(payload).encode()
+
+    return response
+
+
+def fake_get(
+    url: str, params: Dict[str, str] | None = None, **_: Any
+) -> requests.Response:
+    series_id = (params or {}).get("series_id", "")
+
+    if url.endswith("/observations"):
+        return make_response(url, load_observations(series_id))
+
+    return make_response(
+        url, {"seriess": [{"id": series_id, "title": f"Offline {series_id}"}]}
+    )
+
+
+@contextmanager
+def offline_fred() -> Iterator[None]:
+    """Route every FRED request made through requests.get to the fixtures."""
+    with mock.patch.object(requests, "get", fake_get):
+        yield
+
+
+def record(series_ids: List[str]) -> None:
+    sys.path.insert(0, str(FIXTURES_DIR.parent.parent))
+    import FRED_data_service
+
+    data_service = FRED_data_service.FRED_data(API_key=os.environ["FRED_API"])
+    FIXTURES_DIR.mkdir(exist_ok=True)
+
+    for series_id in series_ids:
+        response = data_service.request_get_data(
+            url=data_service.data_url,
+            parameters=data_service.make_FRED_parameters(series_id=series_id),
+        )
+        (FIXTURES_DIR / f"{series_id}.json").write_text(response.text)
+        print(f"Recorded {series_id}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "record":
+        sys.exit(__doc__)
+
+    record(sys.argv[2:])
@@ -0,0 +1,87 @@
+"""Timing, memory and baseline comparison helpers shared by the benchmark suites."""
+
+import gc
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+
+def measure(
+    func: Callable[[], Any], repeat: int = 20, warmup: int = 2
+) -> Dict[str, Any]:
+    """Time repeated calls of func and trace the peak memory of one extra call."""
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    gc.collect()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+
+    # Tracing slows every allocation down, so memory gets its own call.
+    tracemalloc.start()
+    func()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies_array = np.array(latencies)
+    return {
+        "repeat": repeat,
+        "throughput_per_second": repeat / latencies_array.sum(),
+        "latency_seconds": {
+            "min": latencies_array.min(),
+            "mean": latencies_array.mean(),
+            "p50": np.percentile(latencies_array, 50),
+            "p90": np.percentile(latencies_array, 90),
+            "p99": np.percentile(latencies_array, 99),
+            "max": latencies_array.max(),
+        },
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline: Dict[str, Dict[str, Any]],
+    tolerance: float = 0.2,
+    min_difference_seconds: float = 0.0005,
+) -> List[str]:
+    """List the benchmarks whose fastest call is clearly slower than the baseline.
+
+    Other work on the machine only ever adds time, so the fastest of the
+    repeated calls is compared rather than the median. A benchmark regressed
+    when it is slower by more than tolerance, widened to the p90/p50 spread of
+    either run when that is larger, and by more than min_difference_seconds,
+    which keeps timer and scheduler jitter on sub-millisecond benchmarks out.
+    """
+    regressions = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        current_latency = result["latency_seconds"]
+        previous_latency = baseline[name]["latency_seconds"]
+        # Baselines recorded before min was measured only have percentiles
+        statistic = "min" if "min" in previous_latency else "p50"
+        current = current_latency[statistic]
+        previous = previous_latency[statistic]
+
+        spread = max(
+            latency["p90"] / latency["p50"] - 1
+            for latency in (current_latency, previous_latency)
+        )
+        if (
+            current > previous * (1 + max(tolerance, spread))
+            and current - previous > min_difference_seconds
+        ):
+            regressions.append(
+                f"{name}: {statistic} {current * 1000:.3f} ms vs baseline "
+                f"{previous * 1000:.3f} ms ({current / previous - 1:+.0%})"
+            )
+
+    return regressions
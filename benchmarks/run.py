@@ -0,0 +1,148 @@
+"""Run the benchmark suites offline and compare them against a stored baseline.
+
+    python benchmarks/run.py                      # every suite, compared to baseline.json
+    python benchmarks/run.py --suite property_math --repeat 50
+    python benchmarks/run.py --save-baseline      # store this run as the new baseline
+    python benchmarks/run.py --ci                 # also fail without a baseline
+
+Results are written as JSON with throughput, latency percentiles and peak
+memory per benchmark. The exit code is 1 when any benchmark's fastest call
+regressed against the baseline by more than --tolerance, or its p90/p50
+spread if that is larger, and by more than --min-difference-ms. Runs with
+fewer than 10 repeats are not compared. Record baseline.json on the machine
+that runs the comparison, such as the CI runner, and commit it from there; it
+keeps that machine and the numpy and pandas versions it was recorded with.
+With --ci a missing baseline or too few repeats is an error.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+
+import bench_api  # noqa: E402
+import bench_fred_data  # noqa: E402
+import bench_property_math  # noqa: E402
+import fred_stub  # noqa: E402
+import harness  # noqa: E402
+
+MIN_REPEAT_TO_COMPARE = 10
+
+SUITES = {
+    "property_math": bench_property_math,
+    "fred_data": bench_fred_data,
+    "api": bench_api,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--suite", choices=SUITES, action="append")
+    parser.add_argument("--filter", default="", help="only run names containing this")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", type=Path, default=BENCHMARKS_DIR / "results.json")
+    parser.add_argument(
+        "--baseline", type=Path, default=BENCHMARKS_DIR / "baseline.json"
+    )
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument(
+        "--min-difference-ms",
+        type=float,
+        default=0.5,
+        help="ignore slowdowns smaller than this many milliseconds",
+    )
+    parser.add_argument(
+        "--ci", action="store_true", help="fail when there is no baseline to compare to"
+    )
+    args = parser.parse_args()
+
+    results = {}
+    with fred_stub.offline_fred():
+        for suite_name in args.suite or SUITES:
+            for name, func in SUITES[suite_name].benchmarks().items():
+                if args.filter not in name:
+                    continue
+
+                results[name] = harness.measure(func, repeat=args.repeat)
+                latency = results[name]["latency_seconds"]
+                print(
+                    f"{name:<55} p50 {latency['p50'] * 1000:9.3f} ms  "
+                    f"p99 {latency['p99'] * 1000:9.3f} ms  "
+                    f"{results[name]['throughput_per_second']:10.1f}/s  "
+                    f"peak {results[name]['peak_memory_bytes'] / 2**20:8.2f} MiB"
+                )
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        sys.exit(1 if args.ci else 0)
+
+    # A handful of calls says more about the machine than the code
+    if args.repeat < MIN_REPEAT_TO_COMPARE:
+        print(
+            f"Not comparing to the baseline, --repeat {args.repeat} is below "
+            f"{MIN_REPEAT_TO_COMPARE}"
+        )
+        sys.exit(1 if args.ci else 0)
+
+    baseline = json.loads(args.baseline.read_text())
+    # Latencies only compare on like hardware, so say when the machines differ
+    for key in ("platform", "machine", "processor", "cpu_count"):
+        if baseline.get(key) != report[key]:
+            print(
+                f"Baseline was recorded on a different machine "
+                f"({key}: {baseline.get(key)} vs {report[key]})"
+            )
+            break
+    # So do different numpy and pandas versions, which change the code measured
+    for key in ("python", "numpy", "pandas"):
+        if baseline.get(key) != report[key]:
+            print(
+                f"Baseline was recorded with a different {key} "
+                f"({baseline.get(key)} vs {report[key]})"
+            )
+
+    regressions = harness.compare_to_baseline(
+        results=results,
+        baseline=baseline["results"],
+        tolerance=args.tolerance,
+        min_difference_seconds=args.min_difference_ms / 1000,
+    )
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""Score a loan portfolio file in parallel and write the results to Parquet.
+
+The input is a CSV or Parquet file with one loan per row and the columns
+loan_amount, annual_rate (a percentage), term_in_months and property_value.
+loan_id and origination_date are carried through when present. The file is
+read in chunks that are scored in a process pool, and results are appended to
+the output as each chunk finishes, so memory stays bounded by the chunk size
+and the number of chunks in flight.
+
+    python bulk_score_loans.py loans.csv scores.parquet --horizon-months 60
+    python bulk_score_loans.py loans.parquet scores.parquet --monte-carlo CSUSHPISA
+
+Reading and writing Parquet needs pyarrow (pip install "mortgage-dash[bulk]").
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Iterator
+
+import numpy as np
+import pandas as pd
+
+import property_math
+
+REQUIRED_COLUMNS = ["loan_amount", "annual_rate", "term_in_months", "property_value"]
+PASSTHROUGH_COLUMNS = ["loan_id", "origination_date"]
+# Every chunk must produce the same Parquet schema, so passthrough columns are
+# read as strings instead of whatever each chunk's values happen to look like.
+PASSTHROUGH_DTYPES = {column: "string" for column in PASSTHROUGH_COLUMNS}
+EQUITY_QUANTILES = (0.05, 0.5, 0.95)
+
+# Growth of a unit property value at the horizon for every simulated run,
+# sorted. Set in each worker by init_worker when Monte Carlo is requested.
+sorted_growth_at_horizon: np.ndarray | None = None
+
+
+def init_worker(growth_at_horizon: np.ndarray | None) -> None:
+    global sorted_growth_at_horizon
+    sorted_growth_at_horizon = growth_at_horizon
+
+
+def read_loan_chunks(path: Path, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if path.suffix == ".parquet":
+        import pyarrow.parquet as pq
+
+        columns = [
+            column
+            for column in REQUIRED_COLUMNS + PASSTHROUGH_COLUMNS
+            if column in pq.read_schema(path).names
+        ]
+        for batch in pq.ParquetFile(path).iter_batches(
+            batch_size=chunk_size, columns=columns
+        ):
+            df_loans = batch.to_pandas()
+            yield df_loans.astype(
+                {
+                    column: dtype
+                    for column, dtype in PASSTHROUGH_DTYPES.items()
+                    if column in df_loans
+                }
+            )
+    else:
+        yield from pd.read_csv(
+            path,
+            chunksize=chunk_size,
+            usecols=lambda column: column in REQUIRED_COLUMNS + PASSTHROUGH_COLUMNS,
+            dtype=PASSTHROUGH_DTYPES,
+        )
+
+
+def score_loans(df_loans: pd.DataFrame, horizon_in_months: int) -> pd.DataFrame:
+    """Payment, total interest, payoff date and equity at horizon for every row.
+
+    Everything is closed form over the whole chunk. The payment is rounded to
+    cents like calculate_mortgage_payment and the property value is held
+    constant for the equity figures, as in the amortization tab. Rows with a
+    term under one month or a loan amount that is not positive score as NaN
+    and NaT.
+    """
+    loan_amount = df_loans["loan_amount"].to_numpy(dtype=float)
+    rate = df_loans["annual_rate"].to_numpy(dtype=float) / 100 / 12
+    term = df_loans["term_in_months"].to_numpy(dtype=float)
+    is_valid = (term >= 1) & (loan_amount > 0)
+    loan_amount = np.where(is_valid, loan_amount, np.nan)
+    term = np.where(is_valid, term, np.nan)
+    property_value = df_loans["property_value"].to_numpy(dtype=float)
+    horizon = np.minimum(horizon_in_months, term)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth_over_term = (1 + rate) ** term
+        growth_to_horizon = (1 + rate) ** horizon
+        mortgage_payment = np.where(
+            rate == 0,
+            loan_amount / term,
+            loan_amount * rate * growth_over_term / (growth_over_term - 1),
+        ).round(2)
+        balance_at_horizon = np.where(
+            rate == 0,
+            loan_amount - mortgage_payment * horizon,
+            loan_amount * growth_to_horizon
+            - mortgage_payment * (growth_to_horizon - 1) / rate,
+        )
+    balance_at_horizon = np.clip(balance_at_horizon, 0, None)
+
+    df_scores = df_loans[
+        [column for column in PASSTHROUGH_COLUMNS if column in df_loans]
+    ].copy()
+    df_scores["mortgage_payment"] = mortgage_payment
+    # Rounding the payment down at a 0% rate would show a few cents of
+    # negative interest
+    df_scores["total_interest"] = np.clip(
+        mortgage_payment * term - loan_amount, 0, None
+    )
+    if "origination_date" in df_loans:
+        # Month of the last scheduled payment, as the first day of that month
+        origination_month = (
+            pd.to_datetime(df_loans["origination_date"])
+            .to_numpy()
+            .astype("datetime64[M]")
+        )
+        df_scores["payoff_month"] = np.where(
+            is_valid,
+            origination_month
+            + np.nan_to_num(term).astype(int).astype("timedelta64[M]"),
+            np.datetime64("NaT", "M"),
+        ).astype("datetime64[ns]")
+    df_scores["balance_at_horizon"] = balance_at_horizon
+    df_scores["equity_at_horizon"] = property_value - balance_at_horizon
+
+    if sorted_growth_at_horizon is not None:
+        # Equity is linear in the simulated growth, so its quantiles are the
+        # growth quantiles scaled by each loan's property value.
+        growth_quantiles = np.quantile(sorted_growth_at_horizon, EQUITY_QUANTILES)
+        for quantile, growth in zip(EQUITY_QUANTILES, growth_quantiles):
+            df_scores[f"simulated_equity_{quantile * 100:g}th_percentile"] = (
+                property_value * growth - balance_at_horizon
+            )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            df_scores["probability_underwater"] = np.where(
+                is_valid,
+                np.searchsorted(
+                    sorted_growth_at_horizon, balance_at_horizon / property_value
+                )
+                / len(sorted_growth_at_horizon),
+                np.nan,
+            )
+
+    return df_scores
+
+
+def simulated_growth_at_horizon(
+    price_index_key: str, horizon_in_months: int, number_of_runs: int, seed: int
+) -> np.ndarray:
+    import FRED_data_service
+
+    data_service = FRED_data_service.FRED_data(API_key=os.getenv("FRED_API", ""))
+    df_sample_data = data_service.get_FRED_data_observations(
+        series_key_or_series_id=price_index_key
+    )
+    paths = property_math.NormalizedPropertyValuePaths(
+        sample_data=df_sample_data["returns"],
+        seed=seed,
+        number_of_runs=number_of_runs,
+        max_length_of_each_run=horizon_in_months,
+    )
+
+    return np.sort(paths.paths[:, horizon_in_months])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog=__doc__.split("\n\n", 1)[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("input", type=Path, help="CSV or Parquet file of loans")
+    parser.add_argument("output", type=Path, help="Parquet file to write")
+    parser.add_argument("--horizon-months", type=int, default=60)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "--monte-carlo",
+        metavar="PRICE_INDEX",
+        default=None,
+        help="FRED price index to simulate equity at horizon with, needs FRED_API",
+    )
+    parser.add_argument("--number-of-runs", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=81007)
+    args = parser.parse_args()
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    growth_at_horizon = None
+    if args.monte_carlo is not None:
+        growth_at_horizon = simulated_growth_at_horizon(
+            price_index_key=args.monte_carlo,
+            horizon_in_months=args.horizon_months,
+            number_of_runs=args.number_of_runs,
+            seed=args.seed,
+        )
+
+    writer = None
+    rows_written = 0
+    start = time.perf_counter()
+    # Chunks in flight are capped so a fast reader cannot outrun the workers
+    pending: Deque[Future] = deque()
+    max_pending = 2 * args.workers
+
+    def write_next() -> None:
+        nonlocal writer, rows_written
+        table = pa.Table.from_pandas(pending.popleft().result(), preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(args.output, table.schema)
+        writer.write_table(table.cast(writer.schema))
+
+        rows_written += table.num_rows
+        elapsed = time.perf_counter() - start
+        print(
+            f"\r{rows_written:,} loans scored, {rows_written / elapsed:,.0f} rows/sec",
+            end="",
+            file=sys.stderr,
+        )
+
+    completed = False
+    try:
+        with ProcessPoolExecutor(
+            max_workers=args.workers,
+            initializer=init_worker,
+            initargs=(growth_at_horizon,),
+        ) as executor:
+            for df_loans in read_loan_chunks(args.input, args.chunk_size):
+                missing_columns = set(REQUIRED_COLUMNS) - set(df_loans.columns)
+                if missing_columns:
+                    sys.exit(
+                        f"{args.input} is missing columns {sorted(missing_columns)}"
+                    )
+
+                pending.append(
+                    executor.submit(score_loans, df_loans, args.horizon_months)
+                )
+                if len(pending) >= max_pending:
+                    write_next()
+
+            while pending:
+                write_next()
+        completed = True
+    finally:
+        if writer is not None:
+            writer.close()
+            # A partial file would look like a complete portfolio, so drop it
+            if not completed:
+                args.output.unlink(missing_ok=True)
+    print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
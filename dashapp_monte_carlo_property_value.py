@@ -1,10 +1,13 @@
 import os
+from functools import lru_cache
 from typing import Any, Dict, Tuple
-from dash import Dash, dcc, html, Input, Output, callback, dash_table
+from dash import Dash, dcc, html, Input, Output, State, callback, dash_table
 from dash.exceptions import PreventUpdate
+import numpy as np
 import plotly.graph_objects as go
 
 import FRED_data_service
+import keyed_lock
 import property_math
 
 app = Dash()
@@ -31,6 +34,7 @@ app.layout = html.Div(
             ],
             id="data_selector",
         ),
+        dcc.Store(id="simulation_inputs"),
         html.Div(
             children=[],
             id="graph_div",
@@ -51,30 +55,93 @@ app.layout = html.Div(
 )
 
 
+computation_locks = keyed_lock.KeyedLock()
+
+# Changing the property value or term reuses the simulated paths of the same
+# price index, seed and number of runs instead of simulating again.
+normalized_path_cache = property_math.NormalizedPathCache()
+NUMBER_OF_RUNS = 1000
+
+
+@lru_cache(maxsize=16)
+def get_property_value_simulation(
+    term_in_months: int,
+    property_value: float,
+    property_price_index: str,
+    seed: int,
+) -> property_math.MonteCarloPropertyValue:
+    """One scenario per set of inputs so the graph and table show the same runs."""
+    df_sample_data = fred_data_service.get_FRED_data_observations(
+        series_key_or_series_id=property_price_index
+    )
+
+    path_cache_key = (
+        property_price_index,
+        FRED_data_service.get_series_version(df_sample_data),
+        "bootstrap",
+        seed,
+        NUMBER_OF_RUNS,
+    )
+    paths = normalized_path_cache.get(path_cache_key, term_in_months)
+    if paths is None:
+        paths = property_math.NormalizedPropertyValuePaths(
+            sample_data=df_sample_data["returns"],
+            seed=seed,
+            number_of_runs=NUMBER_OF_RUNS,
+            max_length_of_each_run=max(
+                term_in_months, property_math.MAX_CACHED_HORIZON_IN_MONTHS
+            ),
+        )
+        normalized_path_cache.put(path_cache_key, paths)
+
+    monte_carlo_property_value_simulator = paths.scenario(
+        starting_property_value=property_value, length_of_each_run=term_in_months
+    )
+    monte_carlo_property_value_simulator.summary_results()
+
+    return monte_carlo_property_value_simulator
+
+
 @callback(
-    Output(component_id="graph_div", component_property="children"),
+    Output(component_id="simulation_inputs", component_property="data"),
     Input(component_id="term_in_months", component_property="value"),
     Input(component_id="property_value", component_property="value"),
     Input(component_id="property_price_index", component_property="value"),
+    State(component_id="simulation_inputs", component_property="data"),
 )
-def update_property_value(
+def update_simulation_inputs(
     term_in_months: int,
     property_value: float,
     property_price_index: str,
-) -> dcc.Graph:
+    previous_simulation_inputs: Dict[str, Any] | None,
+) -> Dict[str, Any]:
     if term_in_months is None or property_value is None or property_price_index is None:
         raise PreventUpdate
 
-    df_sample_data = fred_data_service.get_FRED_data_observations(
-        series_key_or_series_id=property_price_index
-    )
+    # Keep the seed for the whole session so every scenario reuses the paths
+    if previous_simulation_inputs is None:
+        seed = int(np.random.default_rng().integers(2**32))
+    else:
+        seed = previous_simulation_inputs["seed"]
 
-    sample_data = df_sample_data["returns"]
-    monte_carlo_property_value_simulator = property_math.MonteCarloPropertyValue(
-        starting_property_value=property_value, sample_data=sample_data
-    )
+    return {
+        "term_in_months": term_in_months,
+        "property_value": property_value,
+        "property_price_index": property_price_index,
+        "seed": seed,
+    }
 
-    df = monte_carlo_property_value_simulator.generate_sample_data()
+
+@callback(
+    Output(component_id="graph_div", component_property="children"),
+    Input(component_id="simulation_inputs", component_property="data"),
+)
+def update_property_value(simulation_inputs: Dict[str, Any]) -> dcc.Graph:
+    if simulation_inputs is None:
+        raise PreventUpdate
+
+    with computation_locks.hold(tuple(sorted(simulation_inputs.items()))):
+        df = get_property_value_simulation(**simulation_inputs).df
 
     fig = go.Figure(
         data=[
@@ -84,7 +151,7 @@ def update_property_value(
     )
 
     fig.update_layout(
-        title_text=f"Simulated Property Value based on the past performance of {property_price_index}"
+        title_text=f"Simulated Property Value based on the past performance of {simulation_inputs['property_price_index']}"
     )
     fig.update_layout(hovermode="x")
 
@@ -96,28 +163,16 @@ def update_property_value(
     Output(
         component_id="simulated_property_value_table", component_property="page_size"
     ),
-    Input(component_id="term_in_months", component_property="value"),
-    Input(component_id="property_value", component_property="value"),
-    Input(component_id="property_price_index", component_property="value"),
+    Input(component_id="simulation_inputs", component_property="data"),
 )
 def update_summary_table(
-    term_in_months: int,
-    property_value: float,
-    property_price_index: str,
+    simulation_inputs: Dict[str, Any],
 ) -> Tuple[Dict[Any, Any], int]:
-    if term_in_months is None or property_value is None or property_price_index is None:
+    if simulation_inputs is None:
         raise PreventUpdate
 
-    df_sample_data = fred_data_service.get_FRED_data_observations(
-        series_key_or_series_id=property_price_index
-    )
-
-    sample_data = df_sample_data["returns"]
-    monte_carlo_property_value_simulator = property_math.MonteCarloPropertyValue(
-        starting_property_value=property_value, sample_data=sample_data
-    )
-
-    df = monte_carlo_property_value_simulator.summary_results()
+    with computation_locks.hold(tuple(sorted(simulation_inputs.items()))):
+        df = get_property_value_simulation(**simulation_inputs).df_stats
 
     return df.to_dict("records"), len(df)
 
@@ -1,16 +1,30 @@
-from typing import Dict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict
 import os
-from dash import Dash, dcc, html, Input, Output, callback, dash_table
+import threading
+from dash import Dash, dcc, html, Input, Output, State, callback, dash_table, no_update
 from dash.exceptions import PreventUpdate
 from plotly import graph_objects as go
 import pandas as pd
 
 import FRED_data_service
+import keyed_lock
 import property_math
 
 app = Dash()
 fred_data_service = FRED_data_service.FRED_data(API_key=os.getenv("FRED_API", ""))
 
+# The current rate is fetched in the background so the layout can be served
+# before FRED answers; every page polls until the fetch is done and fills the
+# input, and a failed fetch is started again.
+rate_fetch_executor = ThreadPoolExecutor(max_workers=1)
+rate_fetch_lock = threading.Lock()
+most_recent_interest_rate: Future = rate_fetch_executor.submit(
+    fred_data_service.get_most_recent_interest_rate
+)
+RATE_POLL_INTERVAL_IN_MILLISECONDS = 1000
+
 app.layout = html.Div(
     children=[
         dcc.Input(id="loan_amount", type="number", placeholder="loan_amount", min=1),
@@ -21,7 +35,9 @@ app.layout = html.Div(
             id="annual_rate_percentage",
             type="number",
             placeholder="interest_rate",
-            value=float(fred_data_service.get_most_recent_interest_rate()),
+        ),
+        dcc.Interval(
+            id="interest_rate_poller", interval=RATE_POLL_INTERVAL_IN_MILLISECONDS
         ),
         dcc.Input(id="term_in_months", type="number", value=360, min=1),
         html.Div(
@@ -37,6 +53,7 @@ app.layout = html.Div(
             ],
             id="graph_selector_div",
         ),
+        dcc.Store(id="ammortization_inputs"),
         html.Div(
             children=[],
             id="graph_div",
@@ -57,6 +74,34 @@ app.layout = html.Div(
 )
 
 
+@callback(
+    Output(component_id="annual_rate_percentage", component_property="value"),
+    Output(component_id="interest_rate_poller", component_property="disabled"),
+    Input(component_id="interest_rate_poller", component_property="n_intervals"),
+    State(component_id="annual_rate_percentage", component_property="value"),
+)
+def load_most_recent_interest_rate(_, annual_rate_percentage: float | None):
+    global most_recent_interest_rate
+
+    # Never overwrite a rate the user already entered
+    if annual_rate_percentage is not None:
+        return no_update, True
+
+    with rate_fetch_lock:
+        if not most_recent_interest_rate.done():
+            return no_update, False
+
+        try:
+            return float(most_recent_interest_rate.result()), True
+        except Exception as e:
+            print(f"Could not fetch the most recent interest rate:{e}")
+            # Keep polling while the fetch is tried again
+            most_recent_interest_rate = rate_fetch_executor.submit(
+                fred_data_service.get_most_recent_interest_rate
+            )
+            return no_update, False
+
+
 @callback(
     Output(component_id="estimated_mortgage_payment_grid", component_property="data"),
     Output(
@@ -118,23 +163,42 @@ def update_mortgage_option_range_figure(
     return df_all.to_dict("records"), active_cell
 
 
+computation_locks = keyed_lock.KeyedLock()
+
+
+@lru_cache(maxsize=32)
+def get_ammortization_df(
+    annual_rate_percentage: float,
+    term_in_months: int,
+    loan_amount: float,
+    property_value: float,
+) -> pd.DataFrame:
+    """Build the schedule once per set of inputs, shared by every callback."""
+    mortgage = property_math.Mortgage(
+        annual_rate_percentage=annual_rate_percentage,
+        number_of_periods_for_loan_term=term_in_months,
+        loan_amount=loan_amount,
+        property_value=property_value,
+    )
+
+    return mortgage.get_mortgage_ammortization()
+
+
 @callback(
-    Output(component_id="graph_div", component_property="children"),
+    Output(component_id="ammortization_inputs", component_property="data"),
     Input(component_id="loan_amount", component_property="value"),
     Input(component_id="term_in_months", component_property="value"),
     Input(component_id="property_value", component_property="value"),
     Input(
         component_id="estimated_mortgage_payment_grid", component_property="active_cell"
     ),
-    Input(component_id="graph_selector", component_property="value"),
 )
-def update_ammortization_figure(
+def update_ammortization_inputs(
     loan_amount: float,
     term_in_months: int,
     property_value: float,
     active_cell_selected: Dict[str, str],
-    graph_selector: str,
-):
+) -> Dict[str, Any]:
     if active_cell_selected is None or property_value is None:
         raise PreventUpdate
 
@@ -148,13 +212,28 @@ def update_ammortization_figure(
     else:
         term_in_months_to_use = term_in_months
 
-    mortgage = property_math.Mortgage(
-        annual_rate_percentage=annual_rate_percentage,
-        number_of_periods_for_loan_term=term_in_months_to_use,
-        loan_amount=loan_amount,
-        property_value=property_value,
-    )
-    df = mortgage.get_mortgage_ammortization()
+    return {
+        "annual_rate_percentage": annual_rate_percentage,
+        "term_in_months": term_in_months_to_use,
+        "loan_amount": loan_amount,
+        "property_value": property_value,
+    }
+
+
+@callback(
+    Output(component_id="graph_div", component_property="children"),
+    Input(component_id="ammortization_inputs", component_property="data"),
+    Input(component_id="graph_selector", component_property="value"),
+)
+def update_ammortization_figure(
+    ammortization_inputs: Dict[str, Any],
+    graph_selector: str,
+):
+    if ammortization_inputs is None:
+        raise PreventUpdate
+
+    with computation_locks.hold(tuple(sorted(ammortization_inputs.items()))):
+        df = get_ammortization_df(**ammortization_inputs)
 
     if graph_selector == "Bar Graph":
         fig = go.Figure(
@@ -190,40 +269,14 @@ def update_ammortization_figure(
 @callback(
     Output(component_id="ammortization_table", component_property="data"),
     Output(component_id="ammortization_table", component_property="page_size"),
-    Input(component_id="loan_amount", component_property="value"),
-    Input(component_id="term_in_months", component_property="value"),
-    Input(component_id="property_value", component_property="value"),
-    Input(
-        component_id="estimated_mortgage_payment_grid", component_property="active_cell"
-    ),
+    Input(component_id="ammortization_inputs", component_property="data"),
 )
-def update_ammortization_table(
-    loan_amount: float,
-    term_in_months: int,
-    property_value: float,
-    active_cell_selected: Dict[str, str],
-):
-    if active_cell_selected is None or property_value is None:
+def update_ammortization_table(ammortization_inputs: Dict[str, Any]):
+    if ammortization_inputs is None:
         raise PreventUpdate
 
-    annual_rate_percentage = float(active_cell_selected["column_id"][:-1])
-    row_selected = active_cell_selected["row"]
-
-    if row_selected == 0:
-        term_in_months_to_use = 12 * 15
-    elif row_selected == 1:
-        term_in_months_to_use = 12 * 30
-    else:
-        term_in_months_to_use = term_in_months
-
-    mortgage = property_math.Mortgage(
-        annual_rate_percentage=annual_rate_percentage,
-        number_of_periods_for_loan_term=term_in_months_to_use,
-        loan_amount=loan_amount,
-        property_value=property_value,
-    )
-
-    df = mortgage.get_mortgage_ammortization()
+    with computation_locks.hold(tuple(sorted(ammortization_inputs.items()))):
+        df = get_ammortization_df(**ammortization_inputs)
 
     return df.to_dict("records"), len(df)
 
@@ -0,0 +1,34 @@
+import threading
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, List
+
+
+class KeyedLock:
+    """One lock per key, so only callers working on the same key wait on each other.
+
+    The dash apps fire several callbacks from one store at once. Holding the lock
+    for the store's inputs makes the second callback wait for the first to fill
+    the cache instead of computing the same thing in parallel, while sessions
+    with other inputs carry on. Locks are dropped once nobody holds or waits on
+    them, so the dict stays as small as the number of computations in flight.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Each key's lock and how many callers hold or wait on it
+        self._locks: Dict[Hashable, List] = {}
+
+    @contextmanager
+    def hold(self, key: Hashable) -> Iterator[None]:
+        with self._lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
@@ -0,0 +1,197 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# Upper bounds in seconds of the latency histogram buckets, +Inf is implied.
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+Span = Tuple[str, float]
+
+_lock = threading.Lock()
+_histograms: Dict[Tuple[str, Labels], List[float]] = {}
+_counters: Dict[Tuple[str, Labels], float] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+
+# When set, every timed span in the current context is also appended here so a
+# single request can report its own breakdown.
+_span_collector: ContextVar[List[Span] | None] = ContextVar(
+    "span_collector", default=None
+)
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Labels = ()) -> str:
+    if not labels and not extra:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels + extra)
+    return "{" + pairs + "}"
+
+
+def observe(name: str, value: float, help_text: str = "", **labels: str) -> None:
+    """Add value to the histogram name, counts are cumulative like Prometheus."""
+    key = (name, _labels(labels))
+    with _lock:
+        _help.setdefault(name, ("histogram", help_text))
+        # One count per bucket, then +Inf, sum and count.
+        histogram = _histograms.setdefault(key, [0.0] * (len(LATENCY_BUCKETS) + 3))
+        for index, upper_bound in enumerate(LATENCY_BUCKETS):
+            if value <= upper_bound:
+                histogram[index] += 1
+        histogram[-3] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+def increment(name: str, amount: float = 1, help_text: str = "", **labels: str) -> None:
+    key = (name, _labels(labels))
+    with _lock:
+        _help.setdefault(name, ("counter", help_text))
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    increment(
+        "mortgage_dash_cache_requests_total",
+        help_text="Cache lookups by cache and result.",
+        cache=cache,
+        result="hit" if hit else "miss",
+    )
+
+
+def record_span(name: str, duration: float) -> None:
+    observe(
+        "mortgage_dash_span_duration_seconds",
+        duration,
+        help_text="Time spent in instrumented sections of the computation.",
+        span=name,
+    )
+    collector = _span_collector.get()
+    if collector is not None:
+        collector.append((name, duration))
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+
+def instrument(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of timed."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def collect_spans() -> Iterator[List[Span]]:
+    """Collect the spans recorded in this context.
+
+    Work handed to asyncio.to_thread runs in a copy of the context and is
+    collected too. threading.Thread and ThreadPoolExecutor start from an empty
+    context, so submit contextvars.copy_context().run to them to collect theirs.
+    """
+    spans: List[Span] = []
+    token = _span_collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _span_collector.reset(token)
+
+
+def set_span_collector(spans: List[Span] | None) -> None:
+    """Like collect_spans for code that cannot wrap the work in a with block."""
+    _span_collector.set(spans)
+
+
+def cache_hit_ratios() -> Dict[str, float]:
+    lookups: Dict[str, Dict[str, float]] = {}
+    with _lock:
+        for (name, labels), value in _counters.items():
+            if name == "mortgage_dash_cache_requests_total":
+                label_values = dict(labels)
+                lookups.setdefault(label_values["cache"], {})[
+                    label_values["result"]
+                ] = value
+
+    return {
+        cache: results.get("hit", 0) / (results.get("hit", 0) + results.get("miss", 0))
+        for cache, results in lookups.items()
+    }
+
+
+def render_prometheus() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+        help_texts = dict(_help)
+
+    def header(name: str) -> None:
+        metric_type, help_text = help_texts[name]
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+    previous_name = None
+    for (name, labels), histogram in histograms:
+        if name != previous_name:
+            header(name)
+            previous_name = name
+        for upper_bound, count in zip(LATENCY_BUCKETS, histogram):
+            le = (("le", str(upper_bound)),)
+            lines.append(f"{name}_bucket{_format_labels(labels, le)} {count:g}")
+        lines.append(
+            f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {histogram[-3]:g}"
+        )
+        lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram[-1]:g}")
+
+    for (name, labels), value in counters:
+        if name != previous_name:
+            header(name)
+            previous_name = name
+        lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    ratios = cache_hit_ratios()
+    if ratios:
+        lines.append(
+            "# HELP mortgage_dash_cache_hit_ratio Share of cache lookups that hit."
+        )
+        lines.append("# TYPE mortgage_dash_cache_hit_ratio gauge")
+        for cache, ratio in sorted(ratios.items()):
+            lines.append(f'mortgage_dash_cache_hit_ratio{{cache="{cache}"}} {ratio}')
+
+    return "\n".join(lines) + "\n"
@@ -1,15 +1,24 @@
 import numpy as np
 import pandas as pd
-from decimal import Decimal, getcontext
-from typing import List, Dict
+import threading
+from collections import OrderedDict
+from decimal import Decimal, localcontext
+from typing import Any, Hashable, List, Dict
 from numpy.typing import ArrayLike
 
+import metrics
+
 
 def calculate_mortgage_payment(
     effective_interest_rate_per_compounding_period: float,
     number_of_periods_for_loan_term: int,
     loan_amount: float,
 ) -> Decimal:
+    if effective_interest_rate_per_compounding_period == 0:
+        return convert_to_2_place_decimal(
+            Decimal(loan_amount / number_of_periods_for_loan_term)
+        )
+
     present_value_interest_factor = (
         1
         - (1 + effective_interest_rate_per_compounding_period)
@@ -25,6 +34,60 @@ def convert_to_2_place_decimal(some_decimal: Decimal) -> Decimal:
     return some_decimal.quantize(Decimal("1.00"))
 
 
+def solve_max_affordable_price(
+    target_monthly_payments: ArrayLike,
+    annual_rate_percentages: ArrayLike,
+    number_of_periods_for_loan_terms: ArrayLike,
+    down_payment_percentages: ArrayLike,
+    property_tax_rate_percentage: float = 0.0,
+    annual_insurance: float = 0.0,
+) -> Dict[str, np.ndarray]:
+    """Largest loan and purchase price whose monthly cost meets each target.
+
+    The monthly cost is principal and interest on the loan plus property tax,
+    a percentage of the price, and insurance, a fixed annual amount. Each input
+    is a 1-D grid on its own axis, so the results have shape (payments, rates,
+    terms, down payments) and come from one broadcast pass. The cost is linear
+    in the price, so there is nothing to iterate:
+
+        price = (payment - insurance / 12) / ((1 - down) * a + tax / 12)
+
+    where a is the payment per dollar borrowed. With a 100% down payment and no
+    property tax the cost does not grow with the price, so there is no maximum
+    and the result is NaN.
+    """
+    payments, rates, terms, down_payments = np.ix_(
+        np.atleast_1d(np.asarray(target_monthly_payments, dtype=float)),
+        np.atleast_1d(np.asarray(annual_rate_percentages, dtype=float)) / 100 / 12,
+        np.atleast_1d(np.asarray(number_of_periods_for_loan_terms, dtype=float)),
+        np.atleast_1d(np.asarray(down_payment_percentages, dtype=float)) / 100,
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        payment_per_dollar_borrowed = np.where(
+            rates == 0, 1 / terms, rates / (1 - (1 + rates) ** -terms)
+        )
+        monthly_cost_per_dollar_of_price = (
+            1 - down_payments
+        ) * payment_per_dollar_borrowed + property_tax_rate_percentage / 100 / 12
+
+        max_purchase_price = np.where(
+            monthly_cost_per_dollar_of_price > 0,
+            np.clip(
+                (payments - annual_insurance / 12) / monthly_cost_per_dollar_of_price,
+                0,
+                None,
+            ),
+            np.nan,
+        )
+
+    return {
+        "max_loan_amount": max_purchase_price * (1 - down_payments),
+        "max_purchase_price": max_purchase_price,
+    }
+
+
+@metrics.instrument("property_math.amortization_table")
 def generate_mortgage_amortization_table(
     annual_rate_percentage: float,
     number_of_periods_per_compounding_term: int,
@@ -32,53 +95,61 @@ def generate_mortgage_amortization_table(
     mortgage_payment: float | Decimal,
     property_value: float | Decimal,
 ) -> pd.DataFrame:
-    getcontext().prec = int(Decimal(loan_amount).log10().quantize(Decimal("1"))) + 2
+    # The precision depends on the loan amount, so it is kept to this call.
+    with localcontext() as decimal_context:
+        decimal_context.prec = (
+            int(Decimal(loan_amount).log10().quantize(Decimal("1"))) + 2
+        )
 
-    property_value = Decimal(property_value)
-    mortgage_payment = Decimal(mortgage_payment)
+        property_value = Decimal(property_value)
+        mortgage_payment = Decimal(mortgage_payment)
 
-    beginning_principal: List[Decimal] = [Decimal(loan_amount)]
-    ending_principal: List[Decimal] = []
-    interest_to_pay: List[Decimal] = []
-    principal_payment: List[Decimal] = []
-    equity: List[Decimal] = []
+        beginning_principal: List[Decimal] = [Decimal(loan_amount)]
+        ending_principal: List[Decimal] = []
+        interest_to_pay: List[Decimal] = []
+        principal_payment: List[Decimal] = []
+        equity: List[Decimal] = []
 
-    effective_interest_rate = Decimal(
-        annual_rate_percentage / number_of_periods_per_compounding_term
-    )
+        effective_interest_rate = Decimal(
+            annual_rate_percentage / number_of_periods_per_compounding_term
+        )
 
-    while True:
-        interest_to_pay.append(
-            convert_to_2_place_decimal(
-                beginning_principal[-1] * effective_interest_rate
+        while True:
+            interest_to_pay.append(
+                convert_to_2_place_decimal(
+                    beginning_principal[-1] * effective_interest_rate
+                )
             )
+            principal_payment.append(mortgage_payment - interest_to_pay[-1])
+            ending_principal.append(beginning_principal[-1] - principal_payment[-1])
+            equity.append(property_value - ending_principal[-1])
+            beginning_principal.append(ending_principal[-1])
+
+            if beginning_principal[-1] <= 0:
+                break
+
+        data = {
+            "beginning_principal": beginning_principal[:-1],
+            "interest_to_pay": interest_to_pay,
+            "principal_payment": principal_payment,
+            "ending_principal": ending_principal,
+            "equity": equity,
+        }
+
+        df = pd.DataFrame(data=data).reset_index(names=["period"])
+        df["period"] = df["period"] + 1
+        df["percent of payment to principal"] = df["principal_payment"].div(
+            mortgage_payment
         )
-        principal_payment.append(mortgage_payment - interest_to_pay[-1])
-        ending_principal.append(beginning_principal[-1] - principal_payment[-1])
-        equity.append(property_value - ending_principal[-1])
-        beginning_principal.append(ending_principal[-1])
-
-        if beginning_principal[-1] <= 0:
-            break
-
-    data = {
-        "beginning_principal": beginning_principal[:-1],
-        "interest_to_pay": interest_to_pay,
-        "principal_payment": principal_payment,
-        "ending_principal": ending_principal,
-        "equity": equity,
-    }
-
-    df = pd.DataFrame(data=data).reset_index(names=["period"])
-    df["period"] = df["period"] + 1
-    df["percent of payment to principal"] = df["principal_payment"].div(
-        mortgage_payment
-    )
-    df["percent of payment to interest"] = df["interest_to_pay"].div(mortgage_payment)
-    df["percent of property still debt"] = df["ending_principal"].div(property_value)
-    df["percent of property owned"] = df["equity"].div(property_value)
+        df["percent of payment to interest"] = df["interest_to_pay"].div(
+            mortgage_payment
+        )
+        df["percent of property still debt"] = df["ending_principal"].div(
+            property_value
+        )
+        df["percent of property owned"] = df["equity"].div(property_value)
 
-    return df
+        return df
 
 
 class Mortgage:
@@ -133,27 +204,72 @@ class MonteCarloPropertyValue:
         seed: int | None = None,
         length_of_each_run: int = 360,
         number_of_runs: int = 1000,
+        price_series_column: int | None = None,
+        joint_starting_values: ArrayLike | None = None,
     ) -> None:
+        """sample_data is a 1-D array of returns, or for a joint bootstrap a 2-D
+        (months, series) array such as FRED_series_store.get_sample_returns().
+        A joint bootstrap draws whole months so every series keeps its
+        correlation with the others, price_series_column is the property price
+        index, for example FRED_series_store.get_column("CSUSHPISA"), and
+        joint_starting_values the level each series starts from.
+        """
         self.starting_property_value = starting_property_value
         self.sample_data = self.__clean_sample_data(sample_data)
         self.assumed_constant_annual_inflation = assumed_constant_annual_inflation
         self.length_of_each_run = length_of_each_run
         self.number_of_runs = number_of_runs
+        self.price_series_column = price_series_column
+
+        if self.sample_data.ndim == 2 and price_series_column is None:
+            raise ValueError(
+                "A joint bootstrap needs the price_series_column of the property "
+                "price index"
+            )
+        if self.sample_data.ndim == 2 and joint_starting_values is None:
+            joint_starting_values = np.ones(self.sample_data.shape[1])
+        self.joint_starting_values = joint_starting_values
 
         self.random_number_generator = np.random.default_rng(seed=seed)
 
     def __clean_sample_data(self, sample_data: ArrayLike) -> np.ndarray:
         np_sample_data = np.array(sample_data)
 
+        if np_sample_data.ndim == 2:
+            return np_sample_data[~np.isnan(np_sample_data).any(axis=1)]
+
         return np_sample_data[~np.isnan(np_sample_data)]
 
-    def generate_sample_data(self):
-        sampled_runs = self.random_number_generator.choice(
-            a=self.sample_data,
+    def __generate_joint_sample_data(self) -> np.ndarray:
+        sampled_rows = self.random_number_generator.integers(
+            low=0,
+            high=len(self.sample_data),
             size=(self.number_of_runs, self.length_of_each_run),
-            replace=True,
         )
-        sampled_runs = np.add(sampled_runs, 1)
+        # (runs, periods, series) in one gather of whole months
+        sampled_joint_runs = np.add(self.sample_data[sampled_rows], 1)
+
+        starting_values = np.broadcast_to(
+            np.asarray(self.joint_starting_values, dtype=float),
+            (self.number_of_runs, 1, self.sample_data.shape[1]),
+        )
+        self.compounded_joint_runs = np.cumprod(
+            np.concatenate([starting_values, sampled_joint_runs], axis=1), axis=1
+        )
+
+        return sampled_joint_runs[:, :, self.price_series_column]
+
+    @metrics.instrument("monte_carlo.simulate")
+    def generate_sample_data(self):
+        if self.sample_data.ndim == 2:
+            sampled_runs = self.__generate_joint_sample_data()
+        else:
+            sampled_runs = self.random_number_generator.choice(
+                a=self.sample_data,
+                size=(self.number_of_runs, self.length_of_each_run),
+                replace=True,
+            )
+            sampled_runs = np.add(sampled_runs, 1)
         self.sampled_runs = np.insert(
             arr=sampled_runs, obj=0, values=self.starting_property_value, axis=1
         )
@@ -164,6 +280,7 @@ class MonteCarloPropertyValue:
         )
         return self.df
 
+    @metrics.instrument("monte_carlo.summary")
     def summary_results(self):
         if not hasattr(self, "df"):
             self.generate_sample_data()
@@ -171,7 +288,8 @@ class MonteCarloPropertyValue:
         if hasattr(self, "df_stats"):
             return self.df_stats
 
-        df_last_row = self.df.iloc[-1, 1:]
+        # Every statistic only needs the last period of each run
+        df_last_row = self.compounded_sample_runs[:, -1]
 
         stats: Dict[str, float | np.floating] = {}
 
@@ -187,17 +305,16 @@ class MonteCarloPropertyValue:
         stats["Average End Price"] = average_ending_price
 
         stats["Precent greater than starting price"] = (
-            len(df_last_row[df_last_row > self.starting_property_value].index)
+            np.count_nonzero(df_last_row > self.starting_property_value)
             / self.number_of_runs
         )
 
         stats["Starting Price adjusted for inflation"] = inflation_price
         stats["Precent greater than inflation adjusted price"] = (
-            len(df_last_row[df_last_row > inflation_price].index) / self.number_of_runs
+            np.count_nonzero(df_last_row > inflation_price) / self.number_of_runs
         )
         stats["Precent greater than average ending price"] = (
-            len(df_last_row[df_last_row > average_ending_price].index)
-            / self.number_of_runs
+            np.count_nonzero(df_last_row > average_ending_price) / self.number_of_runs
         )
 
         stats["Lowest Value"] = np.min(df_last_row)
@@ -236,11 +353,542 @@ class MonteCarloPropertyValue:
 
         return self.df_stats
 
+    def load_compounded_runs(self, compounded_sample_runs: np.ndarray) -> pd.DataFrame:
+        """Use already simulated (runs, periods + 1) paths instead of sampling."""
+        self.compounded_sample_runs = compounded_sample_runs
+        self.number_of_runs, self.length_of_each_run = (
+            compounded_sample_runs.shape[0],
+            compounded_sample_runs.shape[1] - 1,
+        )
+
+        self.df = pd.DataFrame(self.compounded_sample_runs.T).reset_index(
+            names=["period"]
+        )
+        return self.df
+
     def selective_runs_to_plot(self, max_number_runs=100):
         # max_number_runs - 5
         return
 
 
+# Cached paths and rolling growth cover at least this many months, 40 years,
+# so requests for any common term reuse the same entry.
+MAX_CACHED_HORIZON_IN_MONTHS = 480
+
+
+class NormalizedPropertyValuePaths:
+    """Simulated paths that start at 1, reused for any scenario on the same data.
+
+    Paths scale linearly with the starting value and a shorter run is a prefix
+    of a longer one, so one simulation at the longest horizon answers every
+    starting value, horizon and inflation assumption by scaling and slicing.
+    Per period quantiles are precomputed the same way.
+    """
+
+    def __init__(
+        self,
+        sample_data: ArrayLike,
+        seed: int | None = None,
+        number_of_runs: int = 1000,
+        max_length_of_each_run: int = MAX_CACHED_HORIZON_IN_MONTHS,
+        quantiles=(0.25, 0.5, 0.75),
+        **monte_carlo_parameters,
+    ) -> None:
+        monte_carlo = MonteCarloPropertyValue(
+            starting_property_value=1,
+            sample_data=sample_data,
+            seed=seed,
+            length_of_each_run=max_length_of_each_run,
+            number_of_runs=number_of_runs,
+            **monte_carlo_parameters,
+        )
+        monte_carlo.generate_sample_data()
+
+        self.max_length_of_each_run = max_length_of_each_run
+        self.paths = monte_carlo.compounded_sample_runs
+        self.quantiles = quantiles
+        self.quantile_paths = np.quantile(self.paths, quantiles, axis=0)
+        self.__make_read_only()
+
+    def __make_read_only(self) -> None:
+        # Cached paths are shared between threads, scenarios only read them
+        self.paths.setflags(write=False)
+        self.quantile_paths.setflags(write=False)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # Unpickled arrays, such as paths from a worker process, are writeable
+        self.__dict__.update(state)
+        self.__make_read_only()
+
+    def scenario(
+        self,
+        starting_property_value: float,
+        length_of_each_run: int,
+        assumed_constant_annual_inflation: float = 0.02,
+    ) -> MonteCarloPropertyValue:
+        """A MonteCarloPropertyValue for this scenario, without re-simulating."""
+        monte_carlo = MonteCarloPropertyValue(
+            starting_property_value=starting_property_value,
+            sample_data=[],
+            assumed_constant_annual_inflation=assumed_constant_annual_inflation,
+        )
+        monte_carlo.load_compounded_runs(
+            self.paths[:, : length_of_each_run + 1] * starting_property_value
+        )
+
+        return monte_carlo
+
+    def quantile_values(
+        self, starting_property_value: float, length_of_each_run: int
+    ) -> Dict[float, np.ndarray]:
+        return {
+            quantile: quantile_path[: length_of_each_run + 1] * starting_property_value
+            for quantile, quantile_path in zip(self.quantiles, self.quantile_paths)
+        }
+
+
+class NormalizedPathCache:
+    """Least recently used cache of NormalizedPropertyValuePaths.
+
+    Keys should identify everything the paths depend on, such as the series
+    version, sampler, seed and number of runs. An entry shorter than the
+    requested horizon counts as a miss.
+    """
+
+    cache_name = "normalized_paths"
+
+    def __init__(self, max_entries: int = 16) -> None:
+        self.max_entries = max_entries
+        self.entries: OrderedDict[Hashable, NormalizedPropertyValuePaths] = (
+            OrderedDict()
+        )
+        self.lock = threading.Lock()
+
+    def number_of_periods_covered(self, paths: NormalizedPropertyValuePaths) -> int:
+        return paths.max_length_of_each_run
+
+    def get(
+        self, key: Hashable, length_of_each_run: int
+    ) -> NormalizedPropertyValuePaths | None:
+        with self.lock:
+            paths = self.entries.get(key)
+            if (
+                paths is None
+                or self.number_of_periods_covered(paths) < length_of_each_run
+            ):
+                metrics.record_cache_lookup(self.cache_name, hit=False)
+                return None
+
+            self.entries.move_to_end(key)
+        metrics.record_cache_lookup(self.cache_name, hit=True)
+
+        return paths
+
+    def put(self, key: Hashable, paths: NormalizedPropertyValuePaths) -> None:
+        with self.lock:
+            self.entries[key] = paths
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+def build_normalized_paths(
+    sample_data: ArrayLike,
+    seed: int,
+    number_of_runs: int,
+    max_length_of_each_run: int,
+) -> Dict[str, Any]:
+    """NormalizedPropertyValuePaths for a process pool worker, with its spans.
+
+    It lives here rather than next to the pool so a worker only has to import
+    this module to unpickle it. The spans are handed back with the paths for
+    the parent to record.
+    """
+    with metrics.collect_spans() as spans:
+        paths = NormalizedPropertyValuePaths(
+            sample_data=sample_data,
+            seed=seed,
+            number_of_runs=number_of_runs,
+            max_length_of_each_run=max_length_of_each_run,
+        )
+
+    return {"paths": paths, "spans": spans}
+
+
+def single_monthly_mortality_from_cpr(
+    conditional_prepayment_rate: ArrayLike,
+) -> np.ndarray:
+    """Convert an annual CPR into the share of balance prepaid each month (SMM)."""
+    return 1 - (1 - np.asarray(conditional_prepayment_rate, dtype=float)) ** (1 / 12)
+
+
+def psa_conditional_prepayment_rate(
+    loan_age_in_months: ArrayLike, psa_speed: float = 100
+) -> np.ndarray:
+    """The PSA ramp: CPR rises 0.2% a month to 6% at month 30, scaled by speed."""
+    loan_age_in_months = np.asarray(loan_age_in_months, dtype=float)
+
+    return 0.06 * np.minimum(loan_age_in_months / 30, 1) * psa_speed / 100
+
+
+def rate_incentive_conditional_prepayment_rate(
+    note_rate_percentages: ArrayLike,
+    market_rate_percentages: ArrayLike,
+    base_cpr: float = 0.06,
+    max_cpr: float = 0.6,
+    incentive_midpoint: float = 1.0,
+    incentive_steepness: float = 2.5,
+) -> np.ndarray:
+    """S-curve of CPR against the refinance incentive, note rate minus market rate.
+
+    Rates are in percent. Arrays broadcast, so a column of note rates against a
+    row of market rates per period gives one CPR per loan and period.
+    """
+    incentive = np.asarray(note_rate_percentages, dtype=float) - np.asarray(
+        market_rate_percentages, dtype=float
+    )
+
+    return base_cpr + (max_cpr - base_cpr) / (
+        1 + np.exp(-incentive_steepness * (incentive - incentive_midpoint))
+    )
+
+
+def market_rate_path(
+    df_interest_rates: pd.DataFrame,
+    number_of_periods: int,
+    historical_start: str | pd.Timestamp | None = None,
+) -> np.ndarray:
+    """Monthly market rate path from FRED_data's MORTGAGE30US observations.
+
+    Without historical_start this is a flat rate assumption, the last observed
+    monthly rate held over the whole projection. With it, the month over month
+    changes observed from historical_start onward are replayed starting from
+    the last observed rate, so a pool can be run through the rate moves of, for
+    example, 2008 from today's level. Periods past the end of the replayed
+    history hold its last rate. A historical_start after the last observation
+    raises ValueError.
+    """
+    monthly_rates = (
+        df_interest_rates["last_value_per_month"].resample("ME").last().dropna()
+    )
+    current_rate = monthly_rates.iloc[-1]
+    if historical_start is None:
+        return np.full(number_of_periods, current_rate, dtype=float)
+
+    replayed_rates = monthly_rates[pd.Timestamp(historical_start) :].to_numpy()
+    if len(replayed_rates) == 0:
+        raise ValueError(
+            f"historical_start {historical_start} is after the last observed "
+            f"rate on {monthly_rates.index[-1]:%Y-%m-%d}"
+        )
+    # Period t moves by the change from historical_start to t months after it
+    path = current_rate + replayed_rates[1 : number_of_periods + 1] - replayed_rates[0]
+
+    return np.concatenate(
+        [
+            path,
+            np.full(
+                number_of_periods - len(path),
+                path[-1] if len(path) else current_rate,
+            ),
+        ]
+    )
+
+
+class MortgagePoolCashFlows:
+    """Projected cash flows of a pool of level payment loans under prepayment.
+
+    A prepayment re-amortizes the loan over its remaining term, so every loan's
+    balance is its scheduled balance factor times its survival factor, the
+    cumulative product of (1 - SMM). That keeps the projection to array
+    operations over loans x periods with no Python loop over either.
+    """
+
+    def __init__(
+        self,
+        loan_amounts: ArrayLike,
+        annual_rate_percentages: ArrayLike,
+        number_of_periods_for_loan_term: ArrayLike,
+        loan_age_in_months: ArrayLike = 0,
+        number_of_periods_per_compounding_term: int = 12,
+    ) -> None:
+        self.loan_amounts = np.asarray(loan_amounts, dtype=float)
+        self.annual_rate_percentages = np.broadcast_to(
+            np.asarray(annual_rate_percentages, dtype=float), self.loan_amounts.shape
+        )
+        self.number_of_periods_for_loan_term = np.broadcast_to(
+            np.asarray(number_of_periods_for_loan_term, dtype=int),
+            self.loan_amounts.shape,
+        )
+        self.loan_age_in_months = np.broadcast_to(
+            np.asarray(loan_age_in_months, dtype=int), self.loan_amounts.shape
+        )
+        self.number_of_periods_per_compounding_term = (
+            number_of_periods_per_compounding_term
+        )
+
+        # loan_amounts are current balances, so seasoned loans amortize over
+        # what is left of their term. Loans at or past their term are paid off
+        # and contribute no cash flows.
+        self.remaining_periods = np.maximum(
+            self.number_of_periods_for_loan_term - self.loan_age_in_months, 0
+        )
+        self.number_of_periods = int(self.remaining_periods.max())
+        self.effective_interest_rate_per_compounding_period = (
+            self.annual_rate_percentages
+            / 100
+            / self.number_of_periods_per_compounding_term
+        )
+
+    def constant_cpr_smm(self, conditional_prepayment_rate: float) -> np.ndarray:
+        return np.broadcast_to(
+            single_monthly_mortality_from_cpr(conditional_prepayment_rate),
+            (len(self.loan_amounts), self.number_of_periods),
+        )
+
+    def psa_smm(self, psa_speed: float = 100) -> np.ndarray:
+        periods = np.arange(1, self.number_of_periods + 1)
+        loan_ages = self.loan_age_in_months[:, np.newaxis] + periods
+
+        return single_monthly_mortality_from_cpr(
+            psa_conditional_prepayment_rate(loan_ages, psa_speed=psa_speed)
+        )
+
+    def rate_incentive_smm(
+        self, market_rate_percentages: ArrayLike, **s_curve_parameters: float
+    ) -> np.ndarray:
+        """SMM from rate_incentive_conditional_prepayment_rate over a market path.
+
+        market_rate_percentages is a single rate or one rate per period, for
+        example from market_rate_path.
+        """
+        return single_monthly_mortality_from_cpr(
+            rate_incentive_conditional_prepayment_rate(
+                self.annual_rate_percentages[:, np.newaxis],
+                np.broadcast_to(market_rate_percentages, (self.number_of_periods,)),
+                **s_curve_parameters,
+            )
+        )
+
+    def scheduled_balance_factors(self) -> np.ndarray:
+        """Share of the balance left after each period with no prepayment.
+
+        Shape (loans, periods + 1), column 0 is the start of the projection.
+        """
+        periods = np.arange(self.number_of_periods + 1)
+        rate = self.effective_interest_rate_per_compounding_period[:, np.newaxis]
+        term = self.remaining_periods[:, np.newaxis]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth_over_term = (1 + rate) ** term
+            factors = (growth_over_term - (1 + rate) ** periods) / (
+                growth_over_term - 1
+            )
+            factors = np.where(rate == 0, 1 - periods / term, factors)
+        factors = np.where(term > 0, factors, 0)
+
+        return np.clip(factors, 0, 1)
+
+    def project_cash_flows(
+        self, single_monthly_mortality: ArrayLike
+    ) -> Dict[str, np.ndarray]:
+        """Per loan cash flows, each array has shape (loans, periods)."""
+        single_monthly_mortality = np.broadcast_to(
+            single_monthly_mortality, (len(self.loan_amounts), self.number_of_periods)
+        )
+        periods = np.arange(1, self.number_of_periods + 1)
+        active = periods <= self.remaining_periods[:, np.newaxis]
+
+        scheduled_balance = self.loan_amounts[:, np.newaxis] * (
+            self.scheduled_balance_factors()
+        )
+        survival_factor = np.cumprod(
+            1 - np.where(active, single_monthly_mortality, 0), axis=1
+        )
+        survival_at_start = np.hstack(
+            [np.ones((len(self.loan_amounts), 1)), survival_factor[:, :-1]]
+        )
+
+        beginning_balance = scheduled_balance[:, :-1] * survival_at_start
+        interest = (
+            beginning_balance
+            * self.effective_interest_rate_per_compounding_period[:, np.newaxis]
+        )
+        scheduled_principal = (
+            scheduled_balance[:, :-1] - scheduled_balance[:, 1:]
+        ) * survival_at_start
+        balance_before_prepayment = beginning_balance - scheduled_principal
+        ending_balance = scheduled_balance[:, 1:] * survival_factor
+        prepaid_principal = balance_before_prepayment - ending_balance
+
+        self.cash_flows = {
+            "beginning_balance": beginning_balance,
+            "scheduled_principal": scheduled_principal,
+            "prepaid_principal": prepaid_principal,
+            "interest": interest,
+            "ending_balance": ending_balance,
+            "survival_factor": survival_factor,
+        }
+
+        return self.cash_flows
+
+    def pool_cash_flows(self, single_monthly_mortality: ArrayLike) -> pd.DataFrame:
+        """Cash flows summed across the pool, one row per period."""
+        cash_flows = self.project_cash_flows(single_monthly_mortality)
+
+        df = pd.DataFrame(
+            {
+                name: values.sum(axis=0)
+                for name, values in cash_flows.items()
+                if name != "survival_factor"
+            }
+        )
+        df["total_cash_flow"] = (
+            df["scheduled_principal"] + df["prepaid_principal"] + df["interest"]
+        )
+        # Matured loans are not in the pool, so only active balances count
+        df["pool_factor"] = (
+            df["ending_balance"] / cash_flows["beginning_balance"][:, :1].sum()
+        )
+        df = df.reset_index(names=["period"])
+        df["period"] = df["period"] + 1
+
+        return df
+
+
+def rolling_compounded_growth(
+    price_index: ArrayLike, max_number_of_periods: int
+) -> np.ndarray:
+    """Growth of the index from every start period over every horizon.
+
+    Row i, column h is price_index[i + h] / price_index[i], taken from the
+    cumulative log returns through a sliding window view instead of a loop.
+    Horizons that run past the end of the series are NaN.
+    """
+    log_prices = np.log(np.asarray(price_index, dtype=float))
+    padded_log_prices = np.concatenate(
+        [log_prices, np.full(max_number_of_periods, np.nan)]
+    )
+    windows = np.lib.stride_tricks.sliding_window_view(
+        padded_log_prices, max_number_of_periods + 1
+    )[: len(log_prices)]
+
+    return np.exp(windows - windows[:, :1])
+
+
+class RollingGrowthCache(NormalizedPathCache):
+    """Least recently used cache of rolling_compounded_growth results.
+
+    Keys should include the series version, see NormalizedPathCache. An entry
+    with fewer horizons than requested counts as a miss.
+    """
+
+    cache_name = "historical_growth"
+
+    def number_of_periods_covered(self, compounded_growth: np.ndarray) -> int:
+        return compounded_growth.shape[1] - 1
+
+
+class HistoricalEquityBacktest:
+    """What happened to a buyer who started in each month of a price index.
+
+    The property value follows the index's actual path from every start date
+    while the loan follows the mortgage's amortization schedule.
+    """
+
+    def __init__(
+        self,
+        mortgage: Mortgage,
+        price_index: pd.Series,
+        length_of_each_run: int | None = None,
+        compounded_growth: np.ndarray | None = None,
+    ) -> None:
+        self.mortgage = mortgage
+        self.price_index = price_index.dropna()
+        self.length_of_each_run = (
+            length_of_each_run or mortgage.number_of_periods_for_loan_term
+        )
+
+        # Growth depends only on the index, so callers can pass in a cached
+        # result computed for at least length_of_each_run periods.
+        if compounded_growth is None:
+            compounded_growth = rolling_compounded_growth(
+                self.price_index, self.length_of_each_run
+            )
+        self.compounded_growth = compounded_growth[:, : self.length_of_each_run + 1]
+
+    def loan_balances(self) -> np.ndarray:
+        """Balance after each period, period 0 is the original loan amount."""
+        df_ammortization = self.mortgage.get_mortgage_ammortization()
+        balances = np.zeros(self.length_of_each_run + 1)
+        balances[0] = self.mortgage.loan_amount
+
+        ending_principal = np.clip(
+            df_ammortization["ending_principal"].to_numpy(dtype=float), 0, None
+        )[: self.length_of_each_run]
+        balances[1 : len(ending_principal) + 1] = ending_principal
+
+        return balances
+
+    def generate_outcomes(self) -> Dict[str, np.ndarray]:
+        """Property value, equity and LTV with shape (start dates, periods + 1)."""
+        property_values = self.mortgage.property_value * self.compounded_growth
+        balances = self.loan_balances()
+
+        self.outcomes = {
+            "property_value": property_values,
+            "equity": property_values - balances,
+            "loan_to_value": balances / property_values,
+        }
+
+        return self.outcomes
+
+    def summary_by_period(self, quantiles=(0.25, 0.5, 0.75)) -> pd.DataFrame:
+        """Quantiles across every start date that reached each period."""
+        if not hasattr(self, "outcomes"):
+            self.generate_outcomes()
+
+        number_of_start_dates = np.count_nonzero(
+            ~np.isnan(self.compounded_growth), axis=0
+        )
+        data: Dict[str, np.ndarray] = {"number_of_start_dates": number_of_start_dates}
+        # Periods no start date reached are all NaN and keep NaN quantiles
+        reached = number_of_start_dates > 0
+        for name, values in self.outcomes.items():
+            values_at_quantiles = np.full((len(quantiles), values.shape[1]), np.nan)
+            values_at_quantiles[:, reached] = np.nanquantile(
+                values[:, reached], quantiles, axis=0
+            )
+            for quantile, quantile_values in zip(quantiles, values_at_quantiles):
+                data[f"{name}_{quantile * 100:g}th_percentile"] = quantile_values
+
+        return pd.DataFrame(data).reset_index(names=["period"])
+
+    def outcomes_at_horizon(self) -> pd.DataFrame:
+        """Final outcome for every start date with a full length_of_each_run."""
+        if not hasattr(self, "outcomes"):
+            self.generate_outcomes()
+
+        completed = ~np.isnan(self.compounded_growth[:, -1])
+        df = pd.DataFrame(
+            {
+                "start_date": self.price_index.index[: len(completed)][completed],
+                "ending_property_value": self.outcomes["property_value"][completed, -1],
+                "equity": self.outcomes["equity"][completed, -1],
+                "loan_to_value": self.outcomes["loan_to_value"][completed, -1],
+            }
+        )
+        df["annual_return"] = (
+            df["ending_property_value"] / self.mortgage.property_value
+        ) ** (12 / self.length_of_each_run) - 1
+
+        return df
+
+
 if __name__ == "__main__":
     sample_data = [
         -0.0145947623533657,